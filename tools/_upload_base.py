@@ -0,0 +1,345 @@
+import json
+import os
+import httpx
+from typing import Optional, Union
+from collections.abc import Generator
+from io import BytesIO
+from urllib.parse import unquote, urlparse
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+from .wechat_api_utils import FileTooLargeError, get_http_client
+
+
+# 微信直接支持的图片格式魔数
+_IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+)
+
+
+# 文件大小显示单位，按1024进制递增
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB')
+
+
+# PIL.Image模块，首次处理图片时才导入，避免未涉及图片的调用也加载Pillow
+_PIL_IMAGE = None
+
+
+def _load_pil_image():
+    """
+    按需导入并缓存PIL.Image模块
+    
+    Returns:
+        module: PIL.Image模块
+    """
+    global _PIL_IMAGE
+    if _PIL_IMAGE is None:
+        from PIL import Image
+        _PIL_IMAGE = Image
+    return _PIL_IMAGE
+
+
+# 设置该环境变量（1/true/yes/on）后按SSIM动态选择JPEG质量，每张图片额外耗时约50-200ms
+_DYNAMIC_QUALITY_ENV = 'WECHAT_DYNAMIC_JPEG_QUALITY'
+# 动态质量的搜索区间，上限同时作为SSIM比较的参考质量
+_DYNAMIC_QUALITY_MIN = 70
+_DYNAMIC_QUALITY_MAX = 95
+# 与参考图相比可接受的最低SSIM
+_DYNAMIC_QUALITY_MIN_SSIM = 0.95
+# 计算SSIM时将图片缩小到的边长与分块大小
+_SSIM_SAMPLE_SIZE = 256
+_SSIM_BLOCK_SIZE = 8
+_SSIM_C1 = (0.01 * 255) ** 2
+_SSIM_C2 = (0.03 * 255) ** 2
+
+
+def _ssim(samples_a: list, samples_b: list) -> float:
+    """
+    按分块计算两组灰度采样的平均SSIM
+    
+    Args:
+        samples_a: 第一张图的灰度像素（_SSIM_SAMPLE_SIZE×_SSIM_SAMPLE_SIZE）
+        samples_b: 第二张图的灰度像素
+        
+    Returns:
+        float: 平均SSIM，1.0表示完全相同
+    """
+    size = _SSIM_SAMPLE_SIZE
+    block = _SSIM_BLOCK_SIZE
+    count = block * block
+    total = 0.0
+    blocks = 0
+    for top in range(0, size, block):
+        for left in range(0, size, block):
+            xs = []
+            ys = []
+            for row in range(top, top + block):
+                start = row * size + left
+                xs.extend(samples_a[start:start + block])
+                ys.extend(samples_b[start:start + block])
+            mean_x = sum(xs) / count
+            mean_y = sum(ys) / count
+            var_x = sum(x * x for x in xs) / count - mean_x * mean_x
+            var_y = sum(y * y for y in ys) / count - mean_y * mean_y
+            cov = sum(x * y for x, y in zip(xs, ys)) / count - mean_x * mean_y
+            total += ((2 * mean_x * mean_y + _SSIM_C1) * (2 * cov + _SSIM_C2)) / (
+                (mean_x * mean_x + mean_y * mean_y + _SSIM_C1) * (var_x + var_y + _SSIM_C2)
+            )
+            blocks += 1
+    return total / blocks
+
+
+def _choose_jpeg_quality(image, **save_options) -> Optional[int]:
+    """
+    在质量区间内二分查找SSIM仍不低于阈值的最低JPEG质量
+    
+    Args:
+        image: 待编码的RGB图片
+        save_options: 编码时使用的其他JPEG参数
+        
+    Returns:
+        Optional[int]: 选定的质量；未开启动态质量时返回None
+    """
+    if os.environ.get(_DYNAMIC_QUALITY_ENV, '').lower() not in ('1', 'true', 'yes', 'on'):
+        return None
+    
+    Image = _load_pil_image()
+    sample_size = (_SSIM_SAMPLE_SIZE, _SSIM_SAMPLE_SIZE)
+    
+    def encode_sample(quality: int) -> list:
+        buf = BytesIO()
+        image.save(buf, format='JPEG', quality=quality, **save_options)
+        buf.seek(0)
+        with Image.open(buf) as decoded:
+            return list(decoded.convert('L').resize(sample_size, Image.Resampling.BOX).getdata())
+    
+    reference = encode_sample(_DYNAMIC_QUALITY_MAX)
+    best = _DYNAMIC_QUALITY_MAX
+    low, high = _DYNAMIC_QUALITY_MIN, _DYNAMIC_QUALITY_MAX - 1
+    while low <= high:
+        quality = (low + high) // 2
+        if _ssim(reference, encode_sample(quality)) >= _DYNAMIC_QUALITY_MIN_SSIM:
+            best = quality
+            high = quality - 1
+        else:
+            low = quality + 1
+    return best
+
+
+class BaseUploadTool(Tool):
+    """
+    上传类工具基类，提供文件输入解析、下载与文件名提取等公共逻辑
+    """
+    # 下载文件时使用的User-Agent
+    DOWNLOAD_USER_AGENT = 'Mozilla/5.0 (compatible; DifyBot/1.0)'
+    # 无法从响应头或URL中获取文件名时使用的默认文件名
+    DEFAULT_FILENAME = 'uploaded_file'
+    
+    def _fail(self, message: str, hint: Optional[str] = None) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        输出错误信息及可选的解决提示
+        
+        Args:
+            message: 错误信息
+            hint: 解决提示（可选）
+            
+        Yields:
+            ToolInvokeMessage: 工具调用消息
+        """
+        yield self.create_text_message(message)
+        if hint:
+            yield self.create_text_message(hint)
+    
+    def _parse_file_input(self, file_input: Union[str, dict]) -> tuple[str, str]:
+        """
+        解析文件输入，支持Dify格式和普通URL
+        
+        Args:
+            file_input: 文件输入，可以是字符串URL或Dify格式的字典
+            
+        Returns:
+            tuple: (file_url, detected_media_type)
+        """
+        if isinstance(file_input, str):
+            # 普通URL不以'{'开头，无需尝试JSON解析并抛出异常
+            if file_input.lstrip()[:1] != '{':
+                return file_input, ''
+            
+            try:
+                # 尝试解析为JSON（Dify格式）
+                file_data = json.loads(file_input)
+                if isinstance(file_data, dict):
+                    file_url = file_data.get('file_url', '')
+                    media_type = file_data.get('media_type', '')
+                    return file_url, media_type
+            except (json.JSONDecodeError, ValueError):
+                # 如果不是JSON，当作普通URL处理
+                pass
+            
+            # 普通URL字符串
+            return file_input, ''
+        
+        elif isinstance(file_input, dict):
+            # 直接是字典格式（Dify格式）
+            file_url = file_input.get('file_url', '')
+            media_type = file_input.get('media_type', '')
+            return file_url, media_type
+        
+        else:
+            # 其他类型，返回空值
+            return '', ''
+    
+    def _download_file(self, file_url: str, max_size: Optional[int] = None) -> tuple[bytearray, str]:
+        """
+        下载文件并返回文件数据和文件名
+        
+        Args:
+            file_url: 文件URL
+            max_size: 最大允许字节数（可选），超过时中止下载
+            
+        Returns:
+            tuple: (file_data, filename)
+        """
+        try:
+            # 允许源站压缩传输，httpx会在读取时透明解压
+            headers = {'User-Agent': self.DOWNLOAD_USER_AGENT, 'Accept-Encoding': 'gzip, deflate'}
+            
+            # 复用共享连接池，同一主机的多次下载无需重新握手
+            with get_http_client().stream('GET', file_url, headers=headers, timeout=30) as response:
+                if response.status_code != 200:
+                    raise Exception(f'HTTP状态码: {response.status_code}')
+                
+                # 获取文件名
+                filename = self._extract_filename(response, file_url)
+                
+                # 读取文件数据
+                file_data = self._read_response_body(response, max_size)
+                
+                if not file_data:
+                    raise Exception('文件内容为空')
+                
+                return file_data, filename
+        
+        except FileTooLargeError:
+            raise
+        except httpx.HTTPError as e:
+            raise Exception(f'网络错误: {str(e)}')
+        except Exception as e:
+            raise Exception(f'下载失败: {str(e)}')
+    
+    def _read_response_body(self, response, max_size: Optional[int] = None) -> bytearray:
+        """
+        分块读取响应体，超过大小限制时立即中止下载
+        
+        Args:
+            response: 流式HTTP响应对象
+            max_size: 最大允许字节数（可选）
+            
+        Returns:
+            bytearray: 响应数据（直接返回下载缓冲区，不再复制为bytes）
+            
+        Raises:
+            FileTooLargeError: 文件超过大小限制时抛出
+        """
+        content_length = response.headers.get('Content-Length', '')
+        # 压缩传输时Content-Length是压缩后的大小，解压后的实际大小只会更大
+        encoded = response.headers.get('Content-Encoding', 'identity').lower() != 'identity'
+        buf = bytearray()
+        if content_length.isdigit():
+            declared_size = int(content_length)
+            if max_size is not None and declared_size > max_size:
+                raise FileTooLargeError(declared_size, max_size)
+            if not encoded:
+                # 已知大小时预先分配缓冲区并按位置写入，避免逐块扩容
+                buf = bytearray(declared_size)
+        
+        offset = 0
+        for chunk in response.iter_bytes(65536):
+            buf[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+            if max_size is not None and offset > max_size:
+                raise FileTooLargeError(offset, max_size, exact=False)
+        del buf[offset:]
+        
+        return buf
+    
+    def _extract_filename(self, response, file_url: str) -> str:
+        """
+        从响应头或URL中提取文件名
+        
+        Args:
+            response: HTTP响应对象
+            file_url: 文件URL
+            
+        Returns:
+            str: 文件名
+        """
+        # 尝试从Content-Disposition头获取文件名
+        content_disposition = response.headers.get('Content-Disposition', '')
+        if 'filename=' in content_disposition:
+            try:
+                filename = content_disposition.split('filename=')[1].strip('"\'')
+                if filename:
+                    return filename
+            except:
+                pass
+        
+        # 从URL中提取文件名
+        try:
+            # urlparse同时剥离查询串与片段，unquote还原URL编码的中文文件名
+            filename = unquote(urlparse(file_url).path.rsplit('/', 1)[-1])
+            if filename and '.' in filename:
+                return filename
+        except:
+            pass
+        
+        # 默认文件名
+        return self.DEFAULT_FILENAME
+    
+    def _is_valid_jpeg_png(self, file_data: bytes) -> Optional[str]:
+        """
+        通过文件头魔数判断是否为微信可直接接受的JPEG/PNG图片
+        
+        Args:
+            file_data: 文件数据
+            
+        Returns:
+            Optional[str]: 'JPEG'或'PNG'，其他格式返回None
+        """
+        for signature, format_name in _IMAGE_SIGNATURES:
+            if file_data[:len(signature)] == signature:
+                return format_name
+        return None
+    
+    def _peek_size(self, file_data: bytes) -> Optional[tuple[int, int, str]]:
+        """
+        只解析文件头获取图片尺寸和格式，不解码像素数据
+        
+        Args:
+            file_data: 文件数据
+            
+        Returns:
+            Optional[tuple]: (width, height, format)，无法识别时返回None
+        """
+        # Image.open是惰性的，只读取文件头，直到load()时才解码像素
+        try:
+            with _load_pil_image().open(BytesIO(file_data)) as image:
+                return (*image.size, image.format)
+        except Exception:
+            return None
+    
+    def _format_file_size(self, size_bytes: int) -> str:
+        """
+        格式化文件大小
+        
+        Args:
+            size_bytes: 文件大小（字节）
+            
+        Returns:
+            str: 格式化后的文件大小
+        """
+        if size_bytes < 1024:
+            return f"{size_bytes} B"
+        # bit_length每增加10位对应单位升一级，直接查表而不逐级比较
+        unit = min((size_bytes.bit_length() - 1) // 10, len(_SIZE_UNITS) - 1)
+        return f"{size_bytes / (1 << (10 * unit)):.1f} {_SIZE_UNITS[unit]}"
\ No newline at end of file
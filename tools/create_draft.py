@@ -1,9 +1,31 @@
 import json
-from typing import Any, Dict, Union
+import re
+from typing import Any, Dict, List, Optional, Union
 from collections.abc import Generator
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
-from .wechat_api_utils import WeChatRequest
+from .wechat_api_utils import WECHAT_ERRORS, get_client
+
+
+# 内容中可能不被允许的HTML标签（忽略大小写，避免对整篇内容调用lower()复制）
+_UNSAFE_TAGS_RE = re.compile(r'<(?:script|iframe)', re.IGNORECASE)
+# 单个图文草稿最多包含的文章数
+_MAX_DRAFT_ARTICLES = 8
+# 单篇文章模式的参数默认值
+_DRAFT_DEFAULTS = {
+    'title': '',
+    'content': '',
+    'author': '',
+    'digest': '',
+    'thumb_media_id': '',
+    'content_source_url': '',
+    'need_open_comment': '0',
+    'only_fans_can_comment': '0'
+}
+# 文章中的文本字段，缺失或为null时按空字符串处理
+_ARTICLE_TEXT_FIELDS = ('title', 'content', 'author', 'digest', 'thumb_media_id', 'content_source_url')
+# 文章中的开关字段（0或1）
+_ARTICLE_FLAG_FIELDS = ('need_open_comment', 'only_fans_can_comment', 'show_cover_pic')
 
 
 class CreateDraftTool(Tool):
@@ -34,15 +56,17 @@ class CreateDraftTool(Tool):
                 yield self.create_text_message('错误：缺少App ID或App Secret配置')
                 return
             
-            # 获取参数
-            title = tool_parameters.get('title', '')
-            content = tool_parameters.get('content', '')
-            author = tool_parameters.get('author', '')
-            digest = tool_parameters.get('digest', '')
-            thumb_media_id = tool_parameters.get('thumb_media_id', '')
-            content_source_url = tool_parameters.get('content_source_url', '')
-            need_open_comment = int(tool_parameters.get('need_open_comment', '0'))
-            only_fans_can_comment = int(tool_parameters.get('only_fans_can_comment', '0'))
+            # 批量模式：提供了articles时，一次请求创建包含多篇文章的草稿
+            articles_input = tool_parameters.get('articles')
+            if articles_input:
+                yield from self._create_batch_draft(app_id, app_secret, articles_input)
+                return
+            
+            # 获取参数（未提供的参数使用默认值）
+            params = _DRAFT_DEFAULTS | tool_parameters
+            title = params['title']
+            content = params['content']
+            thumb_media_id = params['thumb_media_id']
             
             if not title:
                 yield self.create_text_message('错误：缺少文章标题')
@@ -52,69 +76,36 @@ class CreateDraftTool(Tool):
                 yield self.create_text_message('错误：缺少文章内容')
                 return
             
-            # 创建微信API客户端
-            client = WeChatRequest(app_id, app_secret)
-            
             # 检查是否提供了封面图片（对于图文消息是必需的）
             if not thumb_media_id:
                 yield self.create_text_message('错误：创建草稿需要提供封面图片的media_id，请先上传图片素材')
                 return
             
-            # 参数验证和诊断
-            validation_errors = []
-            
-            # 检查字段长度限制
-            if len(title) > 64:
-                validation_errors.append(f"📏 标题过长：{len(title)}/64字符，请缩短标题")
+            # 创建微信API客户端，令牌未缓存时在后台获取，与参数验证和序列化并行
+            client = get_client(app_id, app_secret)
+            token_future = client.prefetch_token()
             
-            if author and len(author) > 8:
-                validation_errors.append(f"👤 作者名过长：{len(author)}/8字符，请缩短作者名")
-            
-            if digest and len(digest) > 120:
-                validation_errors.append(f"📝 摘要过长：{len(digest)}/120字符，请缩短摘要")
-            
-            # 检查media_id格式
-            if not thumb_media_id.strip():
-                validation_errors.append("🖼️ 封面图片media_id为空")
-            elif len(thumb_media_id) < 10:
-                validation_errors.append("🖼️ 封面图片media_id格式可能不正确，长度过短")
-            
-            # 检查内容中的潜在问题
-            if '<script' in content.lower() or '<iframe' in content.lower():
-                validation_errors.append("⚠️ 内容包含可能不被允许的HTML标签（script/iframe）")
+            # 参数验证并构建文章数据（与批量模式共用同一套校验）
+            article_data, validation_errors = self._build_article(params)
             
             if validation_errors:
-                error_msg = "❌ 参数验证失败：\n\n" + "\n".join(validation_errors)
-                error_msg += "\n\n💡 请修正以上问题后重试"
+                error_msg = "\n".join(["❌ 参数验证失败：", "", *validation_errors, "", "💡 请修正以上问题后重试"])
                 yield self.create_text_message(error_msg)
                 return
             
-            # 构建文章数据（符合微信API规范）
-            article_data = {
-                "article_type": "news",  # 默认为图文消息
-                "title": title,
-                "content": content,
-                "author": author,
-                "digest": digest,
-                "thumb_media_id": thumb_media_id,
-                "need_open_comment": need_open_comment,
-                "only_fans_can_comment": only_fans_can_comment
-            }
-            
-            # 如果提供了原文链接，添加到文章数据中
-            if content_source_url:
-                article_data["content_source_url"] = content_source_url
-            
-            # 构建文章列表（微信API要求是数组格式）
-            articles_json = json.dumps([article_data], ensure_ascii=False)
+            # 构建文章列表（微信API要求是数组格式），直接传入列表避免序列化后再解析
+            articles = [article_data]
+            
+            if token_future:
+                token_future.result()
             
             # 创建草稿
-            result = client.create_draft(articles_json)
+            result = client.create_draft(articles)
             
             # 成功创建
-            display_title = str(title)
-            display_author = str(author) if author else '未设置'
-            display_digest = str(digest) if digest else '未设置'
+            display_title = article_data['title']
+            display_author = article_data['author'] or '未设置'
+            display_digest = article_data['digest'] or '未设置'
             
             success_message = (
                 f"✅ 草稿创建成功\n"
@@ -133,85 +124,204 @@ class CreateDraftTool(Tool):
             # 提供更详细的错误诊断信息
             if '45110' in error_msg:
                 detailed_msg = (
-                    f"❌ 创建草稿失败 (错误码: 45110)\n\n"
-                    f"🔍 可能的原因：\n"
-                    f"1. 📝 文章内容格式不符合微信规范\n"
-                    f"2. 🖼️ 封面图片media_id无效或已过期\n"
-                    f"3. 📏 标题、摘要或作者字段超出长度限制\n"
-                    f"4. 🔑 公众号权限不足，未开通草稿功能\n"
-                    f"5. 🌐 内容包含违规信息或敏感词汇\n\n"
-                    f"💡 解决建议：\n"
-                    f"• 检查封面图片是否已成功上传并获得有效media_id\n"
-                    f"• 确认标题≤64字符，摘要≤120字符，作者≤8字符\n"
-                    f"• 验证文章内容是否包含HTML标签或特殊字符\n"
-                    f"• 确保公众号已认证并开通相关接口权限\n"
-                    f"• 检查内容是否符合微信内容规范"
+                    "❌ 创建草稿失败 (错误码: 45110)\n\n"
+                    "🔍 可能的原因：\n"
+                    "1. 📝 文章内容格式不符合微信规范\n"
+                    "2. 🖼️ 封面图片media_id无效或已过期\n"
+                    "3. 📏 标题、摘要或作者字段超出长度限制\n"
+                    "4. 🔑 公众号权限不足，未开通草稿功能\n"
+                    "5. 🌐 内容包含违规信息或敏感词汇\n\n"
+                    "💡 解决建议：\n"
+                    "• 检查封面图片是否已成功上传并获得有效media_id\n"
+                    "• 确认标题≤64字符，摘要≤120字符，作者≤8字符\n"
+                    "• 验证文章内容是否包含HTML标签或特殊字符\n"
+                    "• 确保公众号已认证并开通相关接口权限\n"
+                    "• 检查内容是否符合微信内容规范"
                 )
                 yield self.create_text_message(detailed_msg)
             elif '40164' in error_msg:
                 yield self.create_text_message(
-                    f"❌ IP地址不在白名单中\n\n"
-                    f"请在微信公众平台后台添加服务器IP到白名单：\n"
-                    f"1. 登录微信公众平台 (mp.weixin.qq.com)\n"
-                    f"2. 进入开发 -> 基本配置\n"
-                    f"3. 在IP白名单中添加当前服务器IP地址"
+                    "❌ IP地址不在白名单中\n\n"
+                    "请在微信公众平台后台添加服务器IP到白名单：\n"
+                    "1. 登录微信公众平台 (mp.weixin.qq.com)\n"
+                    "2. 进入开发 -> 基本配置\n"
+                    "3. 在IP白名单中添加当前服务器IP地址"
                 )
             elif '42001' in error_msg:
                 yield self.create_text_message(
-                    f"❌ access_token已过期\n\n"
-                    f"请重新获取access_token或检查AppID和AppSecret配置"
+                    "❌ access_token已过期\n\n"
+                    "请重新获取access_token或检查AppID和AppSecret配置"
                 )
             elif '48001' in error_msg:
                 yield self.create_text_message(
-                    f"❌ 接口权限不足\n\n"
-                    f"请确认公众号已获得草稿管理接口权限，\n"
-                    f"可在公众平台官网-开发者中心查看接口权限"
+                    "❌ 接口权限不足\n\n"
+                    "请确认公众号已获得草稿管理接口权限，\n"
+                    "可在公众平台官网-开发者中心查看接口权限"
                 )
             else:
                 yield self.create_text_message(f'创建草稿时发生错误: {error_msg}')
     
-    def _validate_article(self, article: Dict[str, Any], index: int) -> Union[Dict[str, Any], str]:
+    def _create_batch_draft(
+        self, app_id: str, app_secret: str, articles_input: Union[str, List[Dict[str, Any]]]
+    ) -> Generator[ToolInvokeMessage, None, None]:
         """
-        验证文章数据
+        批量创建草稿，所有文章通过一次API调用提交
+        
+        Args:
+            app_id: 公众号App ID
+            app_secret: 公众号App Secret
+            articles_input: 文章列表或其JSON字符串
+            
+        Yields:
+            ToolInvokeMessage: 工具调用消息
+        """
+        if isinstance(articles_input, str):
+            try:
+                articles = json.loads(articles_input)
+            except json.JSONDecodeError:
+                yield self.create_text_message('错误：articles参数不是有效的JSON数组')
+                return
+        else:
+            articles = articles_input
+        
+        if not isinstance(articles, list) or not articles:
+            yield self.create_text_message('错误：articles参数必须是非空的文章数组')
+            return
+        
+        if len(articles) > _MAX_DRAFT_ARTICLES:
+            yield self.create_text_message(
+                f'错误：单个草稿最多包含{_MAX_DRAFT_ARTICLES}篇文章，当前为{len(articles)}篇'
+            )
+            return
+        
+        client = get_client(app_id, app_secret)
+        token_future = client.prefetch_token()
+        
+        validated_articles = []
+        validation_errors = []
+        for index, article in enumerate(articles, 1):
+            if not isinstance(article, dict):
+                validation_errors.append(f'第{index}篇文章格式错误，应为对象')
+                continue
+            validated, errors = self._build_article(article, f'第{index}篇文章')
+            if errors:
+                validation_errors.extend(errors)
+            else:
+                validated_articles.append(validated)
+        
+        if validation_errors:
+            error_msg = "\n".join(["❌ 参数验证失败：", "", *validation_errors, "", "💡 请修正以上问题后重试"])
+            yield self.create_text_message(error_msg)
+            return
+        
+        if token_future:
+            token_future.result()
+        
+        result = client.create_draft(validated_articles)
+        
+        titles = "\n".join(
+            f"  {index}. {article['title']}" for index, article in enumerate(validated_articles, 1)
+        )
+        success_message = (
+            f"✅ 草稿创建成功\n"
+            f"🆔 草稿ID: {result['media_id']}\n"
+            f"📚 文章数: {len(validated_articles)}\n"
+            f"📄 标题:\n{titles}\n"
+            f"📊 状态: 草稿已保存，可进行发布"
+        )
+        
+        yield self.create_text_message(success_message)
+    
+    def _build_article(self, article: Dict[str, Any], label: str = '') -> tuple[Optional[Dict[str, Any]], List[str]]:
+        """
+        验证文章数据并构建符合微信API规范的文章结构，单篇和批量模式共用
         
         Args:
             article: 文章数据
-            index: 文章索引
+            label: 错误信息前缀（批量模式下为“第N篇文章”）
             
         Returns:
-            Union[Dict[str, Any], str]: 验证后的文章数据或错误信息
+            tuple: (文章数据, 错误信息列表)，存在错误时文章数据为None
         """
-        required_fields = ['title', 'content', 'thumb_media_id']
+        prefix = f'{label}：' if label else ''
+        errors = []
+        
+        # 文本字段缺失或为null时视为空字符串，其他非字符串类型直接报错
+        fields = {}
+        for field in _ARTICLE_TEXT_FIELDS:
+            value = article.get(field)
+            if value is None:
+                value = ''
+            elif not isinstance(value, str):
+                errors.append(f'{prefix}🔤 字段{field}必须是字符串')
+                value = ''
+            fields[field] = value
+        
+        flags = {}
+        for field in _ARTICLE_FLAG_FIELDS:
+            value = article.get(field)
+            if value is None or value == '':
+                if field != 'show_cover_pic':
+                    flags[field] = 0
+                continue
+            try:
+                flags[field] = int(value)
+            except (TypeError, ValueError):
+                errors.append(f'{prefix}🔘 字段{field}必须是0或1')
+        
+        if errors:
+            return None, errors
+        
+        title = fields['title']
+        content = fields['content']
+        author = fields['author']
+        digest = fields['digest']
+        thumb_media_id = fields['thumb_media_id']
         
         # 检查必需字段
-        for field in required_fields:
-            if field not in article or not article[field]:
-                return f'第{index}篇文章缺少必需字段: {field}'
-        
-        # 验证字段长度
-        if len(article['title']) > 64:
-            return f'第{index}篇文章标题超过64个字符限制'
-        
-        if len(article.get('digest', '')) > 120:
-            return f'第{index}篇文章摘要超过120个字符限制'
-        
-        if len(article.get('author', '')) > 8:
-            return f'第{index}篇文章作者名称超过8个字符限制'
-        
-        # 构建标准文章结构
-        validated_article = {
-            'title': article['title'],
-            'author': article.get('author', ''),
-            'digest': article.get('digest', ''),
-            'content': article['content'],
-            'content_source_url': article.get('content_source_url', ''),
-            'thumb_media_id': article['thumb_media_id'],
-            'show_cover_pic': int(article.get('show_cover_pic', 0)),
-            'need_open_comment': int(article.get('need_open_comment', 0)),
-            'only_fans_can_comment': int(article.get('only_fans_can_comment', 0))
+        for field in ('title', 'content', 'thumb_media_id'):
+            if not fields[field]:
+                errors.append(f'{prefix}❗ 缺少必需字段: {field}')
+        
+        # 检查字段长度限制
+        if len(title) > 64:
+            errors.append(f"{prefix}📏 标题过长：{len(title)}/64字符，请缩短标题")
+        
+        if len(author) > 8:
+            errors.append(f"{prefix}👤 作者名过长：{len(author)}/8字符，请缩短作者名")
+        
+        if len(digest) > 120:
+            errors.append(f"{prefix}📝 摘要过长：{len(digest)}/120字符，请缩短摘要")
+        
+        # 检查media_id格式
+        if thumb_media_id and not thumb_media_id.strip():
+            errors.append(f"{prefix}🖼️ 封面图片media_id为空")
+        elif thumb_media_id and len(thumb_media_id) < 10:
+            errors.append(f"{prefix}🖼️ 封面图片media_id格式可能不正确，长度过短")
+        
+        # 检查内容中的潜在问题
+        if _UNSAFE_TAGS_RE.search(content):
+            errors.append(f"{prefix}⚠️ 内容包含可能不被允许的HTML标签（script/iframe）")
+        
+        if errors:
+            return None, errors
+        
+        # 构建文章数据（符合微信API规范）
+        article_data = {
+            "article_type": "news",  # 默认为图文消息
+            "title": title,
+            "content": content,
+            "author": author,
+            "digest": digest,
+            "thumb_media_id": thumb_media_id,
+            **flags
         }
         
-        return validated_article
+        # 如果提供了原文链接，添加到文章数据中
+        if fields['content_source_url']:
+            article_data["content_source_url"] = fields['content_source_url']
+        
+        return article_data, errors
     
     def _get_error_message(self, errcode: int) -> str:
         """
@@ -223,28 +333,4 @@ class CreateDraftTool(Tool):
         Returns:
             str: 错误信息
         """
-        error_messages = {
-            40001: 'access_token无效或已过期',
-            40007: '不合法的媒体文件id',
-            41001: '缺少access_token参数',
-            42001: 'access_token超时',
-            43002: '需要POST请求',
-            44002: 'POST的数据包为空',
-            44003: '图文消息内容为空',
-            45001: '多媒体文件大小超过限制',
-            45002: '消息内容超过限制',
-            45003: '标题字段超过限制',
-            45004: '描述字段超过限制',
-            45005: '链接字段超过限制',
-            45008: '图文消息超过限制',
-            45110: '草稿创建失败，可能是参数格式错误或权限不足（常见原因：作者名超过8字符、标题超过64字符、摘要超过120字符）',
-            47001: '解析JSON/XML内容错误',
-            48001: 'api功能未授权',
-            50001: '用户未授权该api',
-            50002: '用户受限，可能是违规后接口被封禁',
-            85023: '草稿箱已满，请删除部分草稿后重试',
-            85024: '草稿不存在',
-            85025: '草稿已发布，不能重复发布'
-        }
-        
-        return error_messages.get(errcode, f'未知错误码: {errcode}')
\ No newline at end of file
+        return WECHAT_ERRORS.get(errcode, f'未知错误码: {errcode}')
\ No newline at end of file
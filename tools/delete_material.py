@@ -2,7 +2,7 @@ from typing import Any, Dict
 from collections.abc import Generator
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
-from .wechat_api_utils import WeChatRequest
+from .wechat_api_utils import get_client
 
 
 class DeleteMaterialTool(Tool):
@@ -39,7 +39,7 @@ class DeleteMaterialTool(Tool):
                 return
             
             # 创建微信API客户端
-            client = WeChatRequest(app_id, app_secret)
+            client = get_client(app_id, app_secret)
             
             # 删除素材
             result = client.delete_material(media_id)
@@ -3,7 +3,7 @@ from collections.abc import Generator
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 from dify_plugin.errors.tool import ToolProviderCredentialValidationError
-from .wechat_api_utils import WeChatRequest
+from .wechat_api_utils import get_client
 
 
 class GetAccessTokenTool(Tool):
@@ -33,7 +33,7 @@ class GetAccessTokenTool(Tool):
             force_refresh = tool_parameters.get('force_refresh', False)
             
             # 创建微信API客户端
-            client = WeChatRequest(app_id, app_secret)
+            client = get_client(app_id, app_secret)
             
             # 获取访问令牌
             access_token = client.get_access_token(force_refresh)
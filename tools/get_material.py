@@ -1,9 +1,31 @@
 import re
-from typing import Any, Dict
+from typing import Any, Dict, Mapping
 from collections.abc import Generator
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
-from .wechat_api_utils import WeChatRequest
+from .wechat_api_utils import WECHAT_ERRORS, get_client
+
+
+# 预编译的正则表达式
+_UNICODE_ESC_RE = re.compile(r'\\u[0-9a-fA-F]{4}')
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+# MIME主类型 -> 素材类型显示名称
+_MIME_MAJOR_TYPES = {
+    'image': '🖼️ 图片',
+    'audio': '🎵 语音',
+    'video': '🎬 视频'
+}
+
+
+def _replace_unicode_escape(match: re.Match) -> str:
+    """
+    将单个\\uXXXX转义序列转换为对应的Unicode字符，失败时保留原文
+    """
+    unicode_str = match.group(0)
+    try:
+        return unicode_str.encode().decode('unicode_escape')
+    except UnicodeDecodeError:
+        return unicode_str
 
 
 class GetMaterialTool(Tool):
@@ -21,21 +43,22 @@ class GetMaterialTool(Tool):
         Returns:
             str: 解码后的文本
         """
+        # 常见情况：HTTP客户端已正确解码的文本不含转义序列，直接返回
+        if type(text) is str and '\\u' not in text:
+            return text
+        
         if not isinstance(text, str):
             return str(text)
         
-        # 查找所有Unicode转义序列
-        def replace_unicode(match):
-            unicode_str = match.group(0)
+        # 快速路径：纯ASCII文本且所有反斜杠都属于\uXXXX转义时，一次性整体解码
+        if text.isascii() and text.count('\\') == text.count('\\u'):
             try:
-                # 将\uXXXX转换为对应的Unicode字符
-                return unicode_str.encode().decode('unicode_escape')
-            except:
-                return unicode_str
+                return text.encode('ascii').decode('unicode_escape')
+            except UnicodeDecodeError:
+                pass
         
         # 使用正则表达式查找并替换Unicode转义序列
-        pattern = r'\\u[0-9a-fA-F]{4}'
-        return re.sub(pattern, replace_unicode, text)
+        return _UNICODE_ESC_RE.sub(_replace_unicode_escape, text)
     
     def _invoke(self, tool_parameters: Dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         """
@@ -64,7 +87,7 @@ class GetMaterialTool(Tool):
                 return
             
             # 创建微信API客户端
-            client = WeChatRequest(app_id, app_secret)
+            client = get_client(app_id, app_secret)
             
             # 获取素材
             result = client.get_material(media_id)
@@ -73,13 +96,14 @@ class GetMaterialTool(Tool):
             if 'news_item' in result:
                 message = self._handle_news_material(result)
                 yield message
-            elif 'binary_data' in result:
-                # 处理二进制素材（图片、音频、视频等）
-                message = self._handle_binary_material_data(
-                    result['binary_data'], 
-                    result['headers'], 
-                    media_id
-                )
+            elif 'binary_file' in result:
+                # 处理二进制素材（图片、音频、视频等），内容已流式写入临时文件
+                with result['binary_file']:
+                    message = self._handle_binary_material_data(
+                        result['content_length'],
+                        result['headers'],
+                        media_id
+                    )
                 yield message
             else:
                 # 其他类型素材
@@ -117,38 +141,37 @@ class GetMaterialTool(Tool):
             author = self._decode_unicode_escapes(item.get('author', '无作者'))
             digest = self._decode_unicode_escapes(item.get('digest', '无摘要'))
             content = self._decode_unicode_escapes(item.get('content', '无内容'))
-            content_source_url = item.get('content_source_url', '无')
-            thumb_media_id = item.get('thumb_media_id', '无')
-            show_cover_pic = item.get('show_cover_pic', 0)
-            url = item.get('url', '无')
-            thumb_url = item.get('thumb_url', '无')
             
-            message_parts.append(f"\n📄 第{i}篇文章：")
-            message_parts.append(f"📝 标题: {title}")
-            message_parts.append(f"✍️ 作者: {author}")
-            message_parts.append(f"📋 摘要: {digest[:100]}{'...' if len(digest) > 100 else ''}")
-            message_parts.append(f"🔗 原文链接: {content_source_url}")
-            message_parts.append(f"🖼️ 封面媒体ID: {thumb_media_id}")
-            message_parts.append(f"👁️ 显示封面: {'是' if show_cover_pic else '否'}")
-            message_parts.append(f"🌐 文章URL: {url}")
-            message_parts.append(f"🖼️ 封面URL: {thumb_url}")
+            # 每篇文章的信息拼成一个文本块，只追加一次
+            article_block = (
+                f"\n📄 第{i}篇文章：\n"
+                f"📝 标题: {title}\n"
+                f"✍️ 作者: {author}\n"
+                f"📋 摘要: {digest[:100]}{'...' if len(digest) > 100 else ''}\n"
+                f"🔗 原文链接: {item.get('content_source_url', '无')}\n"
+                f"🖼️ 封面媒体ID: {item.get('thumb_media_id', '无')}\n"
+                f"👁️ 显示封面: {'是' if item.get('show_cover_pic', 0) else '否'}\n"
+                f"🌐 文章URL: {item.get('url', '无')}\n"
+                f"🖼️ 封面URL: {item.get('thumb_url', '无')}"
+            )
             
             # 内容预览（限制长度）
             if content:
                 content_preview = content[:200] + '...' if len(content) > 200 else content
                 # 移除HTML标签进行预览
-                import re
-                content_preview = re.sub(r'<[^>]+>', '', content_preview)
-                message_parts.append(f"📖 内容预览: {content_preview}")
+                content_preview = _HTML_TAG_RE.sub('', content_preview)
+                article_block += f"\n📖 内容预览: {content_preview}"
+            
+            message_parts.append(article_block)
         
         return self.create_text_message('\n'.join(message_parts))
     
-    def _handle_binary_material_data(self, response_data: bytes, headers: dict, media_id: str) -> ToolInvokeMessage:
+    def _handle_binary_material_data(self, content_length: int, headers: Mapping[str, str], media_id: str) -> ToolInvokeMessage:
         """
         处理二进制素材响应数据
         
         Args:
-            response_data: 响应数据
+            content_length: 素材大小（字节）
             headers: 响应头
             media_id: 媒体ID
             
@@ -156,17 +179,9 @@ class GetMaterialTool(Tool):
             ToolInvokeMessage: 包含素材信息的消息
         """
         content_type = headers.get('Content-Type', '')
-        content_length = len(response_data)
         
         # 判断素材类型
-        if content_type.startswith('image/'):
-            material_type = '🖼️ 图片'
-        elif content_type.startswith('audio/'):
-            material_type = '🎵 语音'
-        elif content_type.startswith('video/'):
-            material_type = '🎬 视频'
-        else:
-            material_type = '📄 文件'
+        material_type = self._get_material_type(content_type)
         
         success_message = (
             f"✅ 成功获取素材\n"
@@ -179,40 +194,18 @@ class GetMaterialTool(Tool):
         
         return self.create_text_message(success_message)
     
-    def _handle_binary_material(self, response, media_id: str) -> ToolInvokeMessage:
+    def _get_material_type(self, content_type: str) -> str:
         """
-        处理二进制素材响应
+        根据Content-Type判断素材类型
         
         Args:
-            response: HTTP响应对象
-            media_id: 媒体ID
+            content_type: 响应的Content-Type
             
         Returns:
-            ToolInvokeMessage: 包含素材信息的消息
+            str: 素材类型显示名称
         """
-        content_type = response.headers.get('Content-Type', '')
-        content_length = len(response.content)
-        
-        # 判断素材类型
-        if content_type.startswith('image/'):
-            material_type = '🖼️ 图片'
-        elif content_type.startswith('audio/'):
-            material_type = '🎵 语音'
-        elif content_type.startswith('video/'):
-            material_type = '🎬 视频'
-        else:
-            material_type = '📁 文件'
-        
-        message = (
-            f"✅ 成功获取素材\n"
-            f"🆔 媒体ID: {media_id}\n"
-            f"📂 素材类型: {material_type}\n"
-            f"📏 文件大小: {self._format_file_size(content_length)}\n"
-            f"🏷️ Content-Type: {content_type}\n"
-            f"\n💡 提示: 这是一个二进制文件，已成功获取到内容。"
-        )
-        
-        return self.create_text_message(message)
+        major = content_type.split('/', 1)[0].strip().lower()
+        return _MIME_MAJOR_TYPES.get(major, '📄 文件')
     
     def _format_file_size(self, size_bytes: int) -> str:
         """
@@ -241,16 +234,4 @@ class GetMaterialTool(Tool):
         Returns:
             str: 错误信息
         """
-        error_messages = {
-            40001: 'access_token无效或已过期',
-            40007: '不合法的媒体文件id',
-            41001: '缺少access_token参数',
-            42001: 'access_token超时',
-            43002: '需要POST请求',
-            46001: '不存在媒体数据',
-            48001: 'api功能未授权',
-            50001: '用户未授权该api',
-            50002: '用户受限，可能是违规后接口被封禁'
-        }
-        
-        return error_messages.get(errcode, f'未知错误码: {errcode}')
\ No newline at end of file
+        return WECHAT_ERRORS.get(errcode, f'未知错误码: {errcode}')
\ No newline at end of file
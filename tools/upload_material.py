@@ -1,105 +1,99 @@
-import urllib.request
 import json
-from typing import Any, Dict, Union
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Union
 from collections.abc import Generator
 from io import BytesIO
-from PIL import Image
-from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
-from .wechat_api_utils import WeChatRequest
+# 只导入模块而不导入BaseUploadTool类本身，避免插件加载器在本模块中发现多个Tool子类
+from . import _upload_base
+from ._upload_base import _choose_jpeg_quality, _load_pil_image
+from .wechat_api_utils import FileTooLargeError, get_client
 
 
-class UploadMaterialTool(Tool):
+# 超过该大小且颜色数超过65536的不透明PNG按照片处理，转存为JPEG
+_PNG_TO_JPEG_MIN_SIZE = 300 * 1024
+
+# 批量上传图片时并行下载与处理的线程数，同时也是最多缓存的待上传文件数
+_BATCH_WORKERS = 4
+
+
+# 各媒体类型的最大文件大小限制（字节）
+_SIZE_LIMITS: Mapping[str, int] = MappingProxyType({
+    'image': 10 * 1024 * 1024,    # 10MB
+    'voice': 2 * 1024 * 1024,     # 2MB
+    'video': 20 * 1024 * 1024,    # 20MB
+    'thumb': 64 * 1024            # 64KB
+})
+
+# 各媒体类型的默认文件扩展名
+_DEFAULT_EXTENSIONS: Mapping[str, str] = MappingProxyType({
+    'image': 'jpg',
+    'voice': 'mp3',
+    'video': 'mp4',
+    'thumb': 'jpg'
+})
+
+# 各媒体类型对应的Content-Type
+_CONTENT_TYPES: Mapping[str, str] = MappingProxyType({
+    'image': 'image/jpeg',
+    'voice': 'audio/mpeg',
+    'video': 'video/mp4',
+    'thumb': 'image/jpeg'
+})
+
+# 上传素材相关的微信API错误码说明
+_ERROR_MESSAGES: Mapping[int, str] = MappingProxyType({
+    40001: 'access_token无效或已过期',
+    40004: '不合法的媒体文件类型',
+    40005: '不合法的文件类型',
+    40006: '不合法的文件大小',
+    40007: '不合法的媒体文件id',
+    41001: '缺少access_token参数',
+    42001: 'access_token超时',
+    43002: '需要POST请求',
+    44001: '多媒体文件为空',
+    45001: '多媒体文件大小超过限制',
+    40113: '不支持的媒体文件格式',
+    45002: '消息内容超过限制',
+    45003: '标题字段超过限制',
+    45004: '描述字段超过限制',
+    48001: 'api功能未授权',
+    48004: 'api禁止删除被自动回复和自定义菜单引用的素材',
+    50001: '用户未授权该api',
+    50002: '用户受限，可能是违规后接口被封禁'
+})
+
+
+class UploadMaterialTool(_upload_base.BaseUploadTool):
     """
     上传永久素材工具
     """
+    DOWNLOAD_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     
-    def _parse_file_input(self, file_input: Union[str, dict]) -> tuple[str, str]:
-        """
-        解析文件输入，支持Dify格式和普通URL
-        
-        Args:
-            file_input: 文件输入，可以是字符串URL或Dify格式的字典
-            
-        Returns:
-            tuple: (file_url, detected_media_type)
-        """
-        if isinstance(file_input, str):
-            try:
-                # 尝试解析为JSON（Dify格式）
-                file_data = json.loads(file_input)
-                if isinstance(file_data, dict):
-                    file_url = file_data.get('file_url', '')
-                    media_type = file_data.get('media_type', '')
-                    return file_url, media_type
-            except (json.JSONDecodeError, ValueError):
-                # 如果不是JSON，当作普通URL处理
-                pass
-            
-            # 普通URL字符串
-            return file_input, ''
-        
-        elif isinstance(file_input, dict):
-            # 直接是字典格式（Dify格式）
-            file_url = file_input.get('file_url', '')
-            media_type = file_input.get('media_type', '')
-            return file_url, media_type
-        
-        else:
-            # 其他类型，返回空值
-            return '', ''
-    
-    def _download_file(self, file_url: str) -> tuple[bytes, str]:
-        """
-        下载文件并返回文件数据和文件名
-        
-        Args:
-            file_url: 文件URL
-            
-        Returns:
-            tuple: (file_data, filename)
-        """
-        try:
-            # 创建请求，添加User-Agent头
-            req = urllib.request.Request(
-                file_url,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                }
-            )
-            
-            with urllib.request.urlopen(req, timeout=30) as response:
-                if response.status != 200:
-                    raise Exception(f'HTTP状态码: {response.status}')
-                
-                # 获取文件名
-                filename = self._extract_filename(response, file_url)
-                
-                # 读取文件数据
-                file_data = response.read()
-                
-                if not file_data:
-                    raise Exception('文件内容为空')
-                
-                return file_data, filename
-                
-        except urllib.error.URLError as e:
-            raise Exception(f'网络错误: {str(e)}')
-        except Exception as e:
-            raise Exception(f'下载失败: {str(e)}')
-    
-    def _validate_and_process_image(self, file_data: bytes, filename: str) -> tuple[bytes, str]:
+    def _validate_and_process_image(self, file_data: bytes, filename: str, jpeg_only: bool = False) -> tuple[bytes, str]:
         """
         验证和处理图片文件，参考nano项目的图片处理逻辑
         
         Args:
             file_data: 原始文件数据
             filename: 文件名
+            jpeg_only: 是否只接受JPEG（缩略图素材仅支持JPG格式）
             
         Returns:
             tuple: (processed_file_data, processed_filename)
         """
         try:
+            # 仅解析文件头：格式与尺寸均满足要求时直接返回原始数据，跳过解码与重新编码
+            allowed_formats = ('JPEG',) if jpeg_only else ('JPEG', 'PNG')
+            if self._is_valid_jpeg_png(file_data) in allowed_formats:
+                peeked = self._peek_size(file_data)
+                if peeked and peeked[0] <= 2048 and peeked[1] <= 2048:
+                    return file_data, filename
+            
+            Image = _load_pil_image()
+            
             # 验证图像数据
             image = Image.open(BytesIO(file_data))
             
@@ -107,32 +101,55 @@ class UploadMaterialTool(Tool):
             width, height = image.size
             format_name = image.format or 'UNKNOWN'
             
+            # 文件头解析未能给出尺寸时，以Image.open读取的尺寸再判断一次
+            if format_name in allowed_formats and width <= 2048 and height <= 2048:
+                return file_data, filename
+            
             # 检查图片尺寸（微信要求）
             if width > 2048 or height > 2048:
-                # 按比例缩放到2048以内
-                max_size = 2048
-                if width > height:
-                    new_width = max_size
-                    new_height = int(height * max_size / width)
-                else:
-                    new_height = max_size
-                    new_width = int(width * max_size / height)
+                # 大尺寸JPEG让libjpeg直接按1/2、1/4或1/8比例解码，减少后续缩放的工作量
+                if image.format == 'JPEG':
+                    image.draft('RGB', (2048, 2048))
                 
-                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                width, height = new_width, new_height
+                # 按比例原地缩放到2048以内，无需额外保留一份缩放前的图像
+                image.thumbnail((2048, 2048), Image.Resampling.LANCZOS)
             
             # 转换为支持的格式（PNG或JPEG）
             img_byte_arr = BytesIO()
-            
             # 如果是透明图片，保存为PNG；否则保存为JPEG以减小文件大小
-            if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
-                image.save(img_byte_arr, format='PNG', optimize=True)
+            has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+            
+            # 大尺寸照片类PNG的Alpha通道若完全不透明，同样转存为JPEG
+            if (
+                has_alpha
+                and format_name == 'PNG'
+                and 'transparency' not in image.info
+                and len(file_data) > _PNG_TO_JPEG_MIN_SIZE
+                and image.getcolors(65536) is None
+                and image.getchannel('A').getextrema()[0] == 255
+            ):
+                has_alpha = False
+            
+            if jpeg_only and has_alpha:
+                # 缩略图只能保存为JPEG，透明区域以白色背景填充
+                rgba = image.convert('RGBA')
+                image = Image.new('RGB', rgba.size, (255, 255, 255))
+                image.paste(rgba, mask=rgba.getchannel('A'))
+                has_alpha = False
+            
+            if has_alpha:
+                # zlib 6级压缩与9级体积相差很小，但编码速度快得多
+                image.save(img_byte_arr, format='PNG', optimize=False, compress_level=6)
                 processed_filename = filename.rsplit('.', 1)[0] + '.png'
             else:
                 # 转换为RGB模式（JPEG不支持透明度）
                 if image.mode != 'RGB':
                     image = image.convert('RGB')
-                image.save(img_byte_arr, format='JPEG', quality=85, optimize=True)
+                quality = _choose_jpeg_quality(image, optimize=True, progressive=True, subsampling='4:2:0')
+                image.save(
+                    img_byte_arr, format='JPEG', quality=quality or 85, optimize=True,
+                    progressive=True, subsampling='4:2:0'
+                )
                 processed_filename = filename.rsplit('.', 1)[0] + '.jpg'
             
             processed_data = img_byte_arr.getvalue()
@@ -155,45 +172,11 @@ class UploadMaterialTool(Tool):
             tuple: (processed_file_data, processed_filename)
         """
         if media_type in ['image', 'thumb']:
-            return self._validate_and_process_image(file_data, filename)
+            return self._validate_and_process_image(file_data, filename, jpeg_only=media_type == 'thumb')
         else:
             # 对于非图片文件，直接返回原数据
             return file_data, filename
     
-    def _extract_filename(self, response, file_url: str) -> str:
-        """
-        从响应头或URL中提取文件名
-        
-        Args:
-            response: HTTP响应对象
-            file_url: 文件URL
-            
-        Returns:
-            str: 文件名
-        """
-        # 尝试从Content-Disposition头获取文件名
-        content_disposition = response.headers.get('Content-Disposition', '')
-        if 'filename=' in content_disposition:
-            try:
-                filename = content_disposition.split('filename=')[1].strip('"\'')
-                if filename:
-                    return filename
-            except:
-                pass
-        
-        # 从URL中提取文件名
-        try:
-            from urllib.parse import urlparse, unquote
-            parsed_url = urlparse(file_url)
-            filename = unquote(parsed_url.path.split('/')[-1])
-            if filename and '.' in filename:
-                return filename
-        except:
-            pass
-        
-        # 默认文件名
-        return 'uploaded_file'
-    
     def _get_max_file_size(self, media_type: str) -> int:
         """
         获取不同媒体类型的最大文件大小限制（字节）
@@ -204,13 +187,7 @@ class UploadMaterialTool(Tool):
         Returns:
             int: 最大文件大小（字节）
         """
-        size_limits = {
-            'image': 10 * 1024 * 1024,    # 10MB
-            'voice': 2 * 1024 * 1024,     # 2MB
-            'video': 20 * 1024 * 1024,    # 20MB
-            'thumb': 64 * 1024            # 64KB
-        }
-        return size_limits.get(media_type, 10 * 1024 * 1024)  # 默认10MB
+        return _SIZE_LIMITS.get(media_type, 10 * 1024 * 1024)  # 默认10MB
     
     def _invoke(self, tool_parameters: Dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         """
@@ -237,6 +214,15 @@ class UploadMaterialTool(Tool):
             file_input = tool_parameters.get('file_url')
             title = tool_parameters.get('title', '')
             introduction = tool_parameters.get('introduction', '')
+            image_urls_input = tool_parameters.get('image_urls')
+            
+            # 批量上传图片：下载与图片处理在线程池中并行，上传按顺序进行
+            if image_urls_input:
+                if media_type not in ['image', 'thumb']:
+                    yield self.create_text_message('❌ 错误：image_urls参数仅支持image或thumb类型')
+                    return
+                yield from self._upload_image_batch(app_id, app_secret, media_type, image_urls_input)
+                return
             
             if not media_type or not file_input:
                 yield self.create_text_message('❌ 错误：缺少必要参数（媒体类型或文件URL）')
@@ -254,22 +240,19 @@ class UploadMaterialTool(Tool):
                 yield self.create_text_message(f'💡 支持的类型：{"、".join(valid_types)}')
                 return
             
-            # 下载文件
+            # 下载文件（超过大小限制时在下载过程中即中止）
+            max_size = self._get_max_file_size(media_type)
             try:
-                file_data, filename = self._download_file(file_url)
-                
-                # 验证文件大小
-                file_size = len(file_data)
-                max_size = self._get_max_file_size(media_type)
-                if file_size > max_size:
-                    yield self.create_text_message(
-                        f'❌ 文件过大：{self._format_file_size(file_size)}'
-                    )
-                    yield self.create_text_message(
-                        f'💡 {media_type}类型的最大限制：{self._format_file_size(max_size)}'
-                    )
-                    return
-                    
+                file_data, filename = self._download_file(file_url, max_size)
+            except FileTooLargeError as e:
+                size_text = self._format_file_size(e.size)
+                yield self.create_text_message(
+                    f'❌ 文件过大：{size_text if e.exact else "超过" + size_text}'
+                )
+                yield self.create_text_message(
+                    f'💡 {media_type}类型的最大限制：{self._format_file_size(max_size)}'
+                )
+                return
             except Exception as e:
                 yield self.create_text_message(f'❌ 下载文件失败: {str(e)}')
                 yield self.create_text_message('💡 请检查文件URL是否有效，或网络连接是否正常')
@@ -288,7 +271,7 @@ class UploadMaterialTool(Tool):
                     return
             
             # 创建微信API客户端并上传素材
-            client = WeChatRequest(app_id, app_secret)
+            client = get_client(app_id, app_secret)
             result = client.upload_material(media_type, file_data, filename, title, introduction)
             
             # 成功上传
@@ -315,6 +298,120 @@ class UploadMaterialTool(Tool):
             yield self.create_text_message(f'❌ 上传素材时发生未知错误: {str(e)}')
             yield self.create_text_message('🔧 请联系技术支持或查看详细日志')
     
+    def _upload_image_batch(
+        self, app_id: str, app_secret: str, media_type: str, image_urls_input: Union[str, List[Any]]
+    ) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        批量上传图片素材，下载与图片处理在线程池中流水线执行，上传按输入顺序依次进行
+        
+        Args:
+            app_id: 公众号App ID
+            app_secret: 公众号App Secret
+            media_type: 媒体类型（image或thumb）
+            image_urls_input: 图片URL列表，或其JSON数组/逐行分隔的字符串
+            
+        Yields:
+            ToolInvokeMessage: 工具调用消息
+        """
+        if isinstance(image_urls_input, str):
+            if image_urls_input.lstrip()[:1] == '[':
+                try:
+                    image_urls_input = json.loads(image_urls_input)
+                except json.JSONDecodeError:
+                    yield self.create_text_message('❌ 错误：image_urls参数不是有效的JSON数组')
+                    return
+            else:
+                # 仅按行分隔，URL中的逗号（如OSS图片处理参数）属于URL本身
+                image_urls_input = image_urls_input.splitlines()
+        
+        if not isinstance(image_urls_input, list):
+            yield self.create_text_message('❌ 错误：image_urls参数必须是图片URL数组')
+            return
+        
+        file_urls = [self._parse_file_input(item)[0] for item in image_urls_input]
+        file_urls = [url.strip() for url in file_urls if url and url.strip()]
+        if not file_urls:
+            yield self.create_text_message('❌ 错误：image_urls参数中没有有效的图片URL')
+            return
+        
+        max_size = self._get_max_file_size(media_type)
+        client = get_client(app_id, app_secret)
+        lines = []
+        success_count = 0
+        
+        with ThreadPoolExecutor(max_workers=_BATCH_WORKERS) as executor:
+            # 最多提前提交_BATCH_WORKERS个任务，限制同时驻留内存的文件数量
+            url_iter = iter(file_urls)
+            pending = deque()
+            for file_url in url_iter:
+                pending.append(executor.submit(self._prepare_image, file_url, media_type, max_size))
+                if len(pending) >= _BATCH_WORKERS:
+                    break
+            
+            index = 0
+            while pending:
+                future = pending.popleft()
+                next_url = next(url_iter, None)
+                if next_url is not None:
+                    pending.append(executor.submit(self._prepare_image, next_url, media_type, max_size))
+                index += 1
+                
+                try:
+                    file_data, filename = future.result()
+                except FileTooLargeError as e:
+                    size_text = self._format_file_size(e.size)
+                    lines.append(
+                        f'{index}. ❌ 文件过大：{size_text if e.exact else "超过" + size_text}'
+                        f'（最大限制：{self._format_file_size(max_size)}）'
+                    )
+                    continue
+                except Exception as e:
+                    lines.append(f'{index}. ❌ {str(e)}')
+                    continue
+                
+                try:
+                    result = client.upload_material(media_type, file_data, filename)
+                except Exception as e:
+                    lines.append(f'{index}. ❌ 上传失败：{str(e)}')
+                    continue
+                
+                if result.get('errcode') == 0 or 'media_id' in result:
+                    success_count += 1
+                    lines.append(f'{index}. {result.get("media_id")}')
+                else:
+                    error_code = result.get('errcode', -1)
+                    lines.append(
+                        f'{index}. ❌ 上传失败：{self._get_error_message(error_code)} (错误码: {error_code})'
+                    )
+        
+        yield self.create_text_message(
+            "\n".join([f'📦 批量上传完成：成功 {success_count}/{len(file_urls)}', *lines])
+        )
+    
+    def _prepare_image(self, file_url: str, media_type: str, max_size: int) -> tuple[bytes, str]:
+        """
+        下载并处理单张图片，供批量上传的线程池调用
+        
+        Args:
+            file_url: 图片URL
+            media_type: 媒体类型
+            max_size: 最大允许字节数
+            
+        Returns:
+            tuple: (processed_file_data, processed_filename)
+        """
+        try:
+            file_data, filename = self._download_file(file_url, max_size)
+        except FileTooLargeError:
+            raise
+        except Exception as e:
+            raise Exception(f'下载文件失败: {str(e)}')
+        
+        try:
+            return self._validate_media_file(file_data, media_type, filename)
+        except Exception as e:
+            raise Exception(f'图片处理失败: {str(e)}')
+    
     def _get_file_extension(self, file_url: str, media_type: str) -> str:
         """
         根据文件URL和媒体类型获取文件扩展名
@@ -333,14 +430,7 @@ class UploadMaterialTool(Tool):
                 return extension
         
         # 根据媒体类型返回默认扩展名
-        default_extensions = {
-            'image': 'jpg',
-            'voice': 'mp3',
-            'video': 'mp4',
-            'thumb': 'jpg'
-        }
-        
-        return default_extensions.get(media_type, 'bin')
+        return _DEFAULT_EXTENSIONS.get(media_type, 'bin')
     
     def _get_content_type(self, media_type: str) -> str:
         """
@@ -352,31 +442,7 @@ class UploadMaterialTool(Tool):
         Returns:
             str: Content-Type
         """
-        content_types = {
-            'image': 'image/jpeg',
-            'voice': 'audio/mpeg',
-            'video': 'video/mp4',
-            'thumb': 'image/jpeg'
-        }
-        
-        return content_types.get(media_type, 'application/octet-stream')
-    
-    def _format_file_size(self, size_bytes: int) -> str:
-        """
-        格式化文件大小
-        
-        Args:
-            size_bytes: 文件大小（字节）
-            
-        Returns:
-            str: 格式化后的文件大小
-        """
-        if size_bytes < 1024:
-            return f"{size_bytes} B"
-        elif size_bytes < 1024 * 1024:
-            return f"{size_bytes / 1024:.1f} KB"
-        else:
-            return f"{size_bytes / (1024 * 1024):.1f} MB"
+        return _CONTENT_TYPES.get(media_type, 'application/octet-stream')
     
     def _get_error_message(self, errcode: int) -> str:
         """
@@ -388,25 +454,4 @@ class UploadMaterialTool(Tool):
         Returns:
             str: 错误信息
         """
-        error_messages = {
-            40001: 'access_token无效或已过期',
-            40004: '不合法的媒体文件类型',
-            40005: '不合法的文件类型',
-            40006: '不合法的文件大小',
-            40007: '不合法的媒体文件id',
-            41001: '缺少access_token参数',
-            42001: 'access_token超时',
-            43002: '需要POST请求',
-            44001: '多媒体文件为空',
-            45001: '多媒体文件大小超过限制',
-            40113: '不支持的媒体文件格式',
-            45002: '消息内容超过限制',
-            45003: '标题字段超过限制',
-            45004: '描述字段超过限制',
-            48001: 'api功能未授权',
-            48004: 'api禁止删除被自动回复和自定义菜单引用的素材',
-            50001: '用户未授权该api',
-            50002: '用户受限，可能是违规后接口被封禁'
-        }
-        
-        return error_messages.get(errcode, f'未知错误码: {errcode}')
\ No newline at end of file
+        return _ERROR_MESSAGES.get(errcode, f'未知错误码: {errcode}')
\ No newline at end of file
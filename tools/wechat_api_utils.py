@@ -1,9 +1,630 @@
+import atexit
+import functools
+import hashlib
 import json
-from typing import Any, Optional, Dict
-import urllib.request
-import urllib.parse
+import os
+import random
+import threading
+import time
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, BinaryIO, Final, List, Optional, Dict, Mapping, Protocol, Union
+from urllib.parse import urlencode as _urlencode
+import httpx
 from dify_plugin.errors.tool import ToolProviderCredentialValidationError
 
+try:
+    import fcntl
+except ImportError:  # 非POSIX平台
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:  # 未安装orjson时回退到标准库json
+    orjson = None
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+
+# 微信API错误码说明（所有工具共享，只读）
+WECHAT_ERRORS: Final[Mapping[int, str]] = MappingProxyType({
+    40001: 'AppSecret错误或者AppSecret不属于这个公众号',
+    40002: '不合法的凭证类型',
+    40004: '不合法的媒体文件类型',
+    40005: '不合法的文件类型',
+    40006: '不合法的文件大小',
+    40007: '不合法的媒体文件id',
+    40008: '不合法的消息类型',
+    40009: '不合法的图片文件大小',
+    40010: '不合法的语音文件大小',
+    40011: '不合法的视频文件大小',
+    40012: '不合法的缩略图文件大小',
+    40013: '不合法的AppID',
+    40014: '不合法的access_token',
+    40113: '不支持的媒体文件格式',
+    40164: '调用接口的IP地址不在白名单中，请在微信公众平台后台添加服务器IP到白名单',
+    40015: '不合法的菜单类型',
+    40016: '不合法的按钮个数',
+    40017: '不合法的按钮个数',
+    40018: '不合法的按钮名字长度',
+    40019: '不合法的按钮KEY长度',
+    40020: '不合法的按钮URL长度',
+    40021: '不合法的菜单版本号',
+    40022: '不合法的子菜单级数',
+    40023: '不合法的子菜单按钮个数',
+    40024: '不合法的子菜单按钮类型',
+    40025: '不合法的子菜单按钮名字长度',
+    40026: '不合法的子菜单按钮KEY长度',
+    40027: '不合法的子菜单按钮URL长度',
+    40028: '不合法的自定义菜单使用用户',
+    40029: '不合法的oauth_code',
+    40030: '不合法的refresh_token',
+    40031: '不合法的openid列表',
+    40032: '不合法的openid列表长度',
+    40033: '不合法的请求字符，不能包含\\uxxxx格式的字符',
+    40035: '不合法的参数',
+    40038: '不合法的请求格式',
+    40039: '不合法的URL长度',
+    40050: '不合法的分组id',
+    40051: '分组名字不合法',
+    40117: '分组名字不合法',
+    40118: 'media_id大小不合法',
+    40119: 'button类型错误',
+    40120: 'button类型错误',
+    40121: '不合法的media_id类型',
+    40132: '微信号不合法',
+    40137: '不支持的图片格式',
+    40155: '请勿添加其他公众号的主页链接',
+    41001: '缺少access_token参数',
+    41002: '缺少appid参数',
+    41003: '缺少refresh_token参数',
+    41004: '缺少secret参数',
+    41005: '缺少多媒体文件数据',
+    41006: '缺少media_id参数',
+    41007: '缺少子菜单数据',
+    41008: '缺少oauth code',
+    41009: '缺少openid',
+    42001: 'access_token超时，请检查access_token的有效期',
+    42002: 'refresh_token超时',
+    42003: 'oauth_code超时',
+    42007: '用户修改微信密码，accesstoken和refreshtoken失效，需要重新授权',
+    43001: '需要GET请求',
+    43002: '需要POST请求',
+    43003: '需要HTTPS请求',
+    43004: '需要接收者关注',
+    43005: '需要好友关系',
+    43019: '需要将接收者从黑名单中移除',
+    44001: '多媒体文件为空',
+    44002: 'POST的数据包为空',
+    44003: '图文消息内容为空',
+    44004: '文本消息内容为空',
+    45001: '多媒体文件大小超过限制',
+    45002: '消息内容超过限制',
+    45003: '标题字段超过限制',
+    45004: '描述字段超过限制',
+    45005: '链接字段超过限制',
+    45006: '图片链接字段超过限制',
+    45007: '语音播放时间超过限制',
+    45008: '图文消息超过限制',
+    45009: '接口调用超过限制',
+    45010: '创建菜单个数超过限制',
+    45015: '回复时间超过限制',
+    45016: '系统分组，不允许修改',
+    45017: '分组名字过长',
+    45018: '分组数量超过上限',
+    45110: '草稿创建失败，可能是参数格式错误或权限不足（常见原因：作者名超过8字符、标题超过64字符、摘要超过120字符）',
+    45047: '客服接口下行条数超过上限',
+    46001: '不存在媒体数据',
+    46002: '不存在的菜单版本',
+    46003: '不存在的菜单数据',
+    46004: '不存在的用户',
+    47001: '解析JSON/XML内容错误',
+    48001: 'api功能未授权，请确认公众号已获得该接口，可以在公众平台官网-开发者中心页中查看接口权限',
+    48002: '粉丝拒收消息（粉丝在公众号选项中，关闭了"接收消息"）',
+    48003: 'api接口被封禁，请登录mp.weixin.qq.com查看详情',
+    48004: 'api接口被封禁，请登录mp.weixin.qq.com查看详情',
+    48005: 'api禁止删除被自动回复和自定义菜单引用的素材',
+    48006: 'api禁止清零调用次数，因为清零次数达到上限',
+    48008: '没有该类型消息的发送权限',
+    50001: '用户未授权该api',
+    50002: '用户受限，可能是违规后接口被封禁',
+    50005: '用户未关注公众号',
+    61451: '参数错误(invalid parameter)',
+    61452: '无效客服账号(invalid kf_account)',
+    61453: '客服帐号已存在(kf_account exsited)',
+    61454: '客服帐号名长度超过限制(仅允许10个英文字符，不包括@及@后的公众号的微信号)(invalid kf_acount length)',
+    61455: '客服帐号名包含非法字符(仅允许英文+数字)(illegal character in kf_account)',
+    61456: '客服帐号个数超过限制(10个客服账号)(kf_account count exceeded)',
+    61457: '无效头像文件类型(invalid file type)',
+    61450: '系统错误(system error)',
+    61500: '日期格式错误',
+    65301: '不存在此menuid对应的个性化菜单',
+    65302: '没有相应的用户',
+    65303: '没有默认菜单，不能创建个性化菜单',
+    65304: 'MatchRule信息为空',
+    65305: '个性化菜单数量受限',
+    65306: '不支持个性化菜单的帐号',
+    65307: '个性化菜单信息为空',
+    65308: '包含没有响应类型的button',
+    65309: '个性化菜单开关处于关闭状态',
+    65310: '填写了省份或城市信息，国家信息不能为空',
+    65311: '填写了城市信息，省份信息不能为空',
+    65312: '不合法的国家信息',
+    65313: '不合法的省份信息',
+    65314: '不合法的城市信息',
+    65316: '该公众号的菜单设置了过多的域名外跳（最多跳转到3个域名的链接）',
+    65317: '不合法的URL',
+    85023: '草稿箱已满，请删除部分草稿后重试',
+    85024: '草稿不存在',
+    85025: '草稿已发布，不能重复发布',
+    85026: '原创校验中，请稍后重试',
+    85027: '原创校验失败，无法发布',
+    85028: '草稿内容涉嫌违规，无法发布',
+    85029: '发布任务已存在',
+    85030: '发布任务不存在',
+    85031: '发布任务状态错误',
+    85032: '发布任务已完成',
+    85033: '发布任务已取消',
+    85034: '发布任务处理中',
+    85035: '发布任务失败',
+    85036: '草稿已删除，无法发布',
+    85037: '文章正在审核中，请稍后重试',
+    85038: '文章审核不通过，无法发布',
+    85039: '发布频率过快，请稍后重试',
+    85040: '今日发布次数已达上限',
+    9001001: 'POST数据参数不合法',
+    9001002: '远端服务不可用',
+    9001003: 'Ticket不合法',
+    9001004: '获取摇周边用户信息失败',
+    9001005: '获取商户信息失败',
+    9001006: '获取OpenID失败',
+    9001007: '上传文件缺失',
+    9001008: '上传素材的文件类型不合法',
+    9001009: '上传素材的文件尺寸不合法',
+    9001010: '上传失败',
+    9001020: '帐号不合法',
+    9001021: '已有设备激活率低于50%，不能新增设备',
+    9001022: '设备申请数不合法，必须为大于0的数字',
+    9001023: '已存在审核中的设备ID申请',
+    9001024: '一次查询设备ID数量不能超过50',
+    9001025: '设备ID不合法',
+    9001026: '页面ID不合法',
+    9001027: '页面参数不合法',
+    9001028: '一次删除页面ID数量不能超过10',
+    9001029: '页面已应用在设备中，请先解除应用关系再删除',
+    9001030: '一次查询页面ID数量不能超过50',
+    9001031: '时间区间不合法',
+    9001032: '保存设备与页面的绑定关系参数错误',
+    9001033: '门店ID不合法',
+    9001034: '设备备注信息过长',
+    9001035: '设备申请参数不合法',
+    9001036: '查询起始值begin不合法'
+})
+
+# 进程内access_token缓存：(app_id, app_secret的SHA-256摘要) -> (access_token, 过期时间戳(monotonic))
+# 键包含AppSecret摘要，错误或已轮换的AppSecret不会取到其他凭据换来的令牌
+_TOKEN_CACHE: Dict[tuple[str, str], tuple[str, float]] = {}
+# 按缓存键划分的令牌刷新锁，某个公众号刷新令牌时不阻塞其他公众号
+_TOKEN_LOCKS: Dict[tuple[str, str], threading.RLock] = {}
+_TOKEN_LOCKS_LOCK = threading.Lock()
+# 提前刷新的安全余量（秒），避免令牌在请求途中过期；微信平台也会在到期前5分钟更新稳定令牌
+_TOKEN_EXPIRY_MARGIN = 300
+# 表示令牌无效或已过期的错误码，收到后强制刷新令牌并重试一次
+_TOKEN_INVALID_ERRCODES = frozenset({40001, 40014, 42001, 42007})
+# 后台预取令牌的线程池（首次使用时创建），用于让令牌请求与本地数据处理并行
+_TOKEN_PREFETCH_EXECUTOR: Optional['ThreadPoolExecutor'] = None
+_TOKEN_PREFETCH_LOCK = threading.Lock()
+
+
+class TokenStore(Protocol):
+    """
+    跨进程共享的access_token存储，过期时间使用墙钟时间戳(time.time())
+    
+    键由app_id和AppSecret的SHA-256摘要组成，不同AppSecret的令牌互不复用
+    """
+    
+    def get(self, key: str) -> Optional[tuple[str, float]]:
+        ...
+    
+    def set(self, key: str, token: str, expires_at: float) -> None:
+        ...
+    
+    def delete(self, key: str) -> None:
+        ...
+
+
+class FileTokenStore:
+    """
+    基于本地文件的令牌存储，使用fcntl文件锁保证多进程读写安全
+    """
+    
+    def __init__(self, directory: Optional[str] = None):
+        if directory is None:
+            import tempfile
+            directory = tempfile.gettempdir()
+        self.directory = directory
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'wechat_token_{key}.json')
+    
+    def get(self, key: str) -> Optional[tuple[str, float]]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_SH)
+                data = json.load(f)
+            return data['access_token'], float(data['expires_at'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+    
+    def set(self, key: str, token: str, expires_at: float) -> None:
+        fd = os.open(self._path(key), os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, 'r+', encoding='utf-8') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            f.truncate()
+            json.dump({'access_token': token, 'expires_at': expires_at}, f)
+            f.flush()
+    
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+class RedisTokenStore:
+    """
+    基于Redis的令牌存储，使用SET NX EX实现原子的"不存在时写入"
+    """
+    
+    KEY_PREFIX = 'wx:tok:'
+    
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+    
+    def get(self, key: str) -> Optional[tuple[str, float]]:
+        raw = self._redis.get(f'{self.KEY_PREFIX}{key}')
+        if not raw:
+            return None
+        data = json.loads(raw)
+        return data['access_token'], float(data['expires_at'])
+    
+    def set(self, key: str, token: str, expires_at: float) -> None:
+        ttl = int(expires_at - time.time())
+        if ttl <= 0:
+            return
+        value = json.dumps({'access_token': token, 'expires_at': expires_at})
+        self._redis.set(f'{self.KEY_PREFIX}{key}', value, ex=ttl, nx=True)
+    
+    def delete(self, key: str) -> None:
+        self._redis.delete(f'{self.KEY_PREFIX}{key}')
+
+
+_TOKEN_STORE: Optional[TokenStore] = None
+
+
+_HTTP_CLIENT: Optional[httpx.Client] = None
+# 创建客户端的进程ID，fork出的工作进程不能复用父进程的连接
+_HTTP_CLIENT_PID: Optional[int] = None
+_HTTP_CLIENT_LOCK = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """
+    获取进程级共享的HTTP客户端，保持长连接并复用连接池
+    
+    Returns:
+        httpx.Client: HTTP客户端
+    """
+    global _HTTP_CLIENT, _HTTP_CLIENT_PID
+    pid = os.getpid()
+    if _HTTP_CLIENT is None or _HTTP_CLIENT_PID != pid:
+        with _HTTP_CLIENT_LOCK:
+            if _HTTP_CLIENT is None or _HTTP_CLIENT_PID != pid:
+                import importlib.util
+                # fork前创建的连接属于父进程，直接丢弃而不关闭，避免影响父进程
+                transport = httpx.HTTPTransport(
+                    # 安装了h2时启用HTTP/2多路复用
+                    http2=importlib.util.find_spec('h2') is not None,
+                    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+                    retries=_CONNECT_RETRIES
+                )
+                _HTTP_CLIENT = httpx.Client(transport=transport, timeout=30, follow_redirects=True)
+                _HTTP_CLIENT_PID = pid
+    return _HTTP_CLIENT
+
+
+@atexit.register
+def close_http_client() -> None:
+    """
+    关闭共享HTTP客户端，释放连接池中的长连接
+    """
+    global _HTTP_CLIENT
+    with _HTTP_CLIENT_LOCK:
+        if _HTTP_CLIENT is not None and _HTTP_CLIENT_PID == os.getpid():
+            _HTTP_CLIENT.close()
+        _HTTP_CLIENT = None
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶限流器
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """
+        获取一个令牌，令牌不足时阻塞等待
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+            # 令牌不足时预先扣减并在锁外等待，后续请求会顺延排队
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+# 各接口的限流配置：路径 -> (每秒请求数, 桶容量)，未列出的接口不限流
+_RATE_LIMITS: Dict[str, tuple[float, float]] = {
+    '/cgi-bin/draft/add': (10, 10),
+    '/cgi-bin/freepublish/submit': (1, 1),
+}
+_RATE_BUCKETS: Dict[tuple[str, str], TokenBucket] = {}
+_RATE_BUCKETS_LOCK = threading.Lock()
+# 频率限制类错误码：系统繁忙(-1)、接口调用超过限制(45009，每日配额，退避期内不会恢复)
+_RATE_LIMITED_ERRCODES = frozenset({-1, 45009})
+# 退避后重试的错误码：系统繁忙(-1)；上传失败(9001010)仅在幂等接口上重试
+_RETRY_ERRCODES = frozenset({-1})
+_IDEMPOTENT_RETRY_ERRCODES = frozenset({9001010})
+# 媒体文件类型、大小或media_id不合法的错误码
+_INVALID_MEDIA_ERRCODES = frozenset({
+    40004, 40005, 40006, 40007, 40009, 40010, 40011, 40012, 40113, 40137, 45001, 9001008, 9001009
+})
+# 网关类5xx可能是暂时不可用，仅对幂等接口重试；500可能已写入数据，不重试
+_RETRY_STATUS_CODES = (502, 503, 504)
+_MAX_RETRIES = 3
+# 建立连接失败（请求尚未发出）时由传输层重试的次数
+_CONNECT_RETRIES = 2
+# 重复执行没有副作用的接口：网关5xx或长连接被服务端断开时可以重发
+# 新增草稿、上传素材、发布等接口可能已被处理（如网关504），重发会产生重复数据，不在此列
+_IDEMPOTENT_PATHS = frozenset({'/cgi-bin/stable_token', '/cgi-bin/material/get_material'})
+_BACKOFF_BASE = 0.5
+_BACKOFF_MAX = 8.0
+# 流式下载的分块大小，以及临时文件保留在内存中的最大字节数
+_STREAM_CHUNK_SIZE = 64 * 1024
+_SPOOL_MAX_SIZE = 1024 * 1024
+# multipart/form-data的分隔符及固定片段，只在导入时编码一次
+_MULTIPART_BOUNDARY = '----WebKitFormBoundary7MA4YWxkTrZu0gW'
+_MULTIPART_CONTENT_TYPE = f'multipart/form-data; boundary={_MULTIPART_BOUNDARY}'
+_MULTIPART_DELIMITER = f'--{_MULTIPART_BOUNDARY}\r\n'.encode()
+_MULTIPART_CLOSE = f'--{_MULTIPART_BOUNDARY}--'.encode()
+_MULTIPART_FILE_CONTENT_TYPE = b'Content-Type: application/octet-stream\r\n\r\n'
+_CRLF = b'\r\n'
+# 批量上传图片时的并发线程数，线程共享同一个HTTP连接池
+_BATCH_UPLOAD_WORKERS = 8
+
+
+def _get_rate_bucket(app_id: str, path: str) -> Optional[TokenBucket]:
+    """
+    获取(app_id, 接口路径)对应的限流令牌桶
+    
+    Args:
+        app_id: 公众号App ID
+        path: 接口路径
+        
+    Returns:
+        Optional[TokenBucket]: 令牌桶，接口未配置限流时返回None
+    """
+    limit = _RATE_LIMITS.get(path)
+    if not limit:
+        return None
+    key = (app_id, path)
+    with _RATE_BUCKETS_LOCK:
+        bucket = _RATE_BUCKETS.get(key)
+        if bucket is None:
+            bucket = _RATE_BUCKETS[key] = TokenBucket(*limit)
+    return bucket
+
+
+def _backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """
+    计算退避等待时间，优先使用服务端返回的Retry-After
+    
+    Args:
+        attempt: 已重试次数（从0开始）
+        retry_after: Retry-After响应头
+        
+    Returns:
+        float: 等待秒数
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), _BACKOFF_MAX)
+        except ValueError:
+            pass
+    delay = min(_BACKOFF_MAX, _BACKOFF_BASE * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _get_token_lock(cache_key: tuple[str, str]) -> threading.RLock:
+    """
+    获取令牌缓存键对应的刷新锁
+    
+    Args:
+        cache_key: (app_id, app_secret摘要)
+        
+    Returns:
+        threading.RLock: 刷新锁
+    """
+    lock = _TOKEN_LOCKS.get(cache_key)
+    if lock is None:
+        with _TOKEN_LOCKS_LOCK:
+            lock = _TOKEN_LOCKS.setdefault(cache_key, threading.RLock())
+    return lock
+
+
+def _get_prefetch_executor() -> 'ThreadPoolExecutor':
+    """
+    获取令牌预取线程池，首次调用时才导入concurrent.futures并创建
+    
+    Returns:
+        ThreadPoolExecutor: 线程池
+    """
+    global _TOKEN_PREFETCH_EXECUTOR
+    if _TOKEN_PREFETCH_EXECUTOR is None:
+        with _TOKEN_PREFETCH_LOCK:
+            if _TOKEN_PREFETCH_EXECUTOR is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _TOKEN_PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='wechat-token')
+    return _TOKEN_PREFETCH_EXECUTOR
+
+
+def get_token_store() -> TokenStore:
+    """
+    获取共享令牌存储：设置了WECHAT_REDIS_URL（或REDIS_URL）环境变量时使用Redis，否则使用本地文件
+    
+    Returns:
+        TokenStore: 令牌存储实例
+    """
+    global _TOKEN_STORE
+    if _TOKEN_STORE is None:
+        redis_url = os.environ.get('WECHAT_REDIS_URL') or os.environ.get('REDIS_URL')
+        store: Optional[TokenStore] = None
+        if redis_url:
+            try:
+                store = RedisTokenStore(redis_url)
+            except ImportError:
+                store = None
+        _TOKEN_STORE = store or FileTokenStore()
+    return _TOKEN_STORE
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """
+    将对象序列化为UTF-8编码的JSON字节串，优先使用orjson一次生成bytes
+    
+    Args:
+        obj: 待序列化对象
+        
+    Returns:
+        bytes: JSON字节串（非ASCII字符不转义）
+    """
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def _json_loads(data: Union[bytes, str]) -> Any:
+    """
+    解析JSON，orjson可直接解析bytes而无需先解码为str
+    
+    Args:
+        data: JSON字节串或字符串
+        
+    Returns:
+        Any: 解析结果
+        
+    Raises:
+        json.JSONDecodeError: JSON格式错误时抛出（orjson.JSONDecodeError是其子类）
+    """
+    if orjson:
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+@functools.lru_cache(maxsize=32)
+def get_client(app_id: str, app_secret: str) -> 'WeChatRequest':
+    """
+    获取按凭据缓存的WeChatRequest实例，避免每次调用工具都重新创建客户端
+    
+    最多缓存32组凭据；轮换AppSecret后可调用get_client.cache_clear()丢弃旧实例
+    
+    Args:
+        app_id: 微信公众号AppID
+        app_secret: 微信公众号AppSecret
+        
+    Returns:
+        WeChatRequest: 对应凭据的客户端实例
+    """
+    return WeChatRequest(app_id, app_secret)
+
+
+class FileTooLargeError(Exception):
+    """
+    下载的文件超过大小限制
+    """
+    
+    def __init__(self, size: int, max_size: int, exact: bool = True):
+        self.size = size
+        self.max_size = max_size
+        # size为Content-Length声明的准确大小时为True，否则为中止下载前已接收的字节数
+        self.exact = exact
+        super().__init__(f'文件大小 {size} 字节超过限制 {max_size} 字节')
+
+
+class WeChatError(Exception):
+    """
+    微信API返回的业务错误（errcode非0）
+    """
+    
+    def __init__(self, code: int, msg: str):
+        self.code = code
+        self.msg = msg
+        super().__init__(f"{msg} (错误码: {code})")
+
+
+class WeChatTokenExpired(WeChatError):
+    """
+    access_token无效或已过期
+    """
+
+
+class WeChatRateLimited(WeChatError):
+    """
+    触发接口频率限制或服务端繁忙，重试后仍未成功
+    """
+
+
+class WeChatInvalidMedia(WeChatError):
+    """
+    媒体文件类型、大小或media_id不合法
+    """
+
+
+def _raise_for_errcode(errcode: int, msg: str, require_token: bool = True) -> None:
+    """
+    按错误码类别抛出对应的WeChatError子类
+    
+    Args:
+        errcode: 微信API错误码
+        msg: 错误信息
+        require_token: 请求是否携带access_token（获取令牌本身失败时40001表示AppSecret错误，不视为令牌过期）
+        
+    Raises:
+        WeChatError: 总是抛出
+    """
+    if require_token and errcode in _TOKEN_INVALID_ERRCODES:
+        raise WeChatTokenExpired(errcode, msg)
+    if errcode in _RATE_LIMITED_ERRCODES:
+        raise WeChatRateLimited(errcode, msg)
+    if errcode in _INVALID_MEDIA_ERRCODES:
+        raise WeChatInvalidMedia(errcode, msg)
+    raise WeChatError(errcode, msg)
+
 
 def auth(credentials: Dict[str, Any]) -> None:
     """
@@ -20,10 +641,12 @@ def auth(credentials: Dict[str, Any]) -> None:
     if not app_id or not app_secret:
         raise ToolProviderCredentialValidationError("app_id and app_secret is required")
     try:
-        client = WeChatRequest(app_id, app_secret)
-        assert client.access_token is not None
+        # 始终请求stable_token校验凭据，不使用任何缓存的令牌
+        access_token = get_client(app_id, app_secret).fetch_access_token()
     except Exception as e:
         raise ToolProviderCredentialValidationError(str(e))
+    if not access_token:
+        raise ToolProviderCredentialValidationError("未能获取access_token，请检查app_id和app_secret")
 
 
 class WeChatRequest:
@@ -32,41 +655,57 @@ class WeChatRequest:
     """
     API_BASE_URL = "https://api.weixin.qq.com"
     
+    # 各接口路径，请求时直接与API_BASE_URL拼接，无需解析URL
+    _PATH_STABLE_TOKEN = "/cgi-bin/stable_token"
+    _PATH_ADD_MATERIAL = "/cgi-bin/material/add_material"
+    _PATH_GET_MATERIAL = "/cgi-bin/material/get_material"
+    _PATH_DEL_MATERIAL = "/cgi-bin/material/del_material"
+    _PATH_ADD_DRAFT = "/cgi-bin/draft/add"
+    _PATH_SUBMIT_PUBLISH = "/cgi-bin/freepublish/submit"
+    _PATH_UPLOAD_IMAGE = "/cgi-bin/media/uploadimg"
+    
+    # 实例按凭据缓存复用，只保存凭据和最近使用的令牌，不需要实例字典
+    __slots__ = ('app_id', 'app_secret', '_access_token', '_cache_key', '_store_key')
+    
     def __init__(self, app_id: str, app_secret: str):
         self.app_id = app_id
         self.app_secret = app_secret
         self._access_token = None
+        # 令牌缓存和共享存储的键，只保存AppSecret的摘要
+        secret_digest = hashlib.sha256(app_secret.encode('utf-8')).hexdigest()
+        self._cache_key = (app_id, secret_digest)
+        self._store_key = f'{app_id}_{secret_digest}'
     
     @property
     def access_token(self) -> str:
         """
-        获取访问令牌，支持缓存
+        获取访问令牌，支持缓存（过期后自动刷新）
         """
-        if not self._access_token:
-            self._access_token = self.get_access_token()
-        return self._access_token
+        return self.get_access_token()
     
     def _send_request(
         self,
-        url: str,
+        path: str,
         method: str = "POST",
         require_token: bool = True,
         payload: Optional[Dict] = None,
         params: Optional[Dict] = None,
         files: Optional[Dict] = None,
-        timeout: int = 30
+        timeout: int = 30,
+        stream: bool = False
     ) -> Dict[str, Any]:
         """
         发送HTTP请求的统一方法
         
         Args:
-            url: 请求URL
+            path: 接口路径（如/cgi-bin/draft/add）
             method: HTTP方法
             require_token: 是否需要访问令牌
             payload: JSON数据
             params: URL参数
-            files: 文件数据
+            files: 文件数据，值可以是bytes-like对象或BytesIO等文件对象
             timeout: 超时时间
+            stream: 是否流式读取二进制响应（用于大体积素材下载）
             
         Returns:
             Dict: API响应数据
@@ -74,108 +713,260 @@ class WeChatRequest:
         Raises:
             Exception: 当API返回错误时抛出异常
         """
-        # 构建完整URL
-        if params:
-            if require_token:
-                params['access_token'] = self.access_token
-            url_parts = urllib.parse.urlparse(url)
-            query = urllib.parse.urlencode(params)
-            url = urllib.parse.urlunparse((
-                url_parts.scheme, url_parts.netloc, url_parts.path,
-                url_parts.params, query, url_parts.fragment
-            ))
-        elif require_token:
-            separator = '&' if '?' in url else '?'
-            url = f"{url}{separator}access_token={self.access_token}"
+        # 构建完整URL，HTTP方法直接作为字符串传给客户端
+        access_token = self.access_token if require_token else None
+        request_url = self._build_url(path, params, access_token)
+        method = method.upper()
         
         # 准备请求数据
         data = None
         headers = {"User-Agent": "Dify WeChat Plugin"}
         
         if files:
-            # 处理文件上传
-            boundary = '----WebKitFormBoundary7MA4YWxkTrZu0gW'
-            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+            # 处理文件上传：请求体按分块发送，文件数据只被引用而不拼接复制
+            headers['Content-Type'] = _MULTIPART_CONTENT_TYPE
+            data = list(self._iter_multipart(payload, files))
+            headers['Content-Length'] = str(sum(len(part) for part in data))
             
-            body_parts = []
+        elif payload:
+            headers['Content-Type'] = 'application/json'
+            data = _json_dumps(payload)
+        
+        # 按(app_id, 接口路径)限流，超出WeChat频率限制或网关暂时不可用时退避重试
+        bucket = _get_rate_bucket(self.app_id, path)
+        
+        token_refreshed = False
+        idempotent = method == 'GET' or path in _IDEMPOTENT_PATHS
+        # 只有幂等接口在长连接被断开时重发一次
+        can_resend = idempotent
+        for attempt in range(_MAX_RETRIES + 1):
+            if bucket:
+                bucket.acquire()
             
-            # 添加表单字段
-            if payload:
-                for key, value in payload.items():
-                    body_parts.append(f'--{boundary}'.encode())
-                    body_parts.append(f'Content-Disposition: form-data; name="{key}"'.encode())
-                    body_parts.append(b'')
-                    body_parts.append(str(value).encode())
+            # 发送请求（复用进程级连接池，避免每次调用重新进行TCP/TLS握手）
+            client = get_http_client()
+            request = client.build_request(
+                method, request_url, content=data, headers=headers, timeout=timeout
+            )
+            try:
+                try:
+                    response = client.send(request, stream=stream)
+                except httpx.RemoteProtocolError:
+                    # 连接池中的长连接可能已被服务端关闭，换一个新连接重发一次
+                    if not can_resend:
+                        raise
+                    can_resend = False
+                    response = client.send(request, stream=stream)
+            except httpx.TimeoutException as e:
+                raise Exception(f"网络连接错误: 请求超时 ({str(e)})")
+            except httpx.HTTPError as e:
+                raise Exception(f"网络连接错误: {str(e)}")
             
-            # 添加文件
-            for field_name, file_info in files.items():
-                if isinstance(file_info, tuple):
-                    file_data, filename = file_info
-                else:
-                    file_data = file_info
-                    filename = 'file'
+            try:
+                retry_after = response.headers.get('Retry-After')
+                status = response.status_code
+                retryable = status == 429 or (status in _RETRY_STATUS_CODES and idempotent)
+                if retryable and attempt < _MAX_RETRIES:
+                    time.sleep(_backoff_delay(attempt, retry_after))
+                    continue
                 
-                body_parts.append(f'--{boundary}'.encode())
-                body_parts.append(
-                    f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"'.encode()
-                )
-                body_parts.append(b'Content-Type: application/octet-stream')
-                body_parts.append(b'')
-                body_parts.append(file_data)
+                if response.status_code != 200:
+                    raise Exception(f"HTTP请求失败，状态码: {response.status_code}")
+                
+                try:
+                    result = self._parse_response(response, stream)
+                except httpx.HTTPError as e:
+                    raise Exception(f"网络连接错误: {str(e)}")
+            finally:
+                response.close()
             
-            body_parts.append(f'--{boundary}--'.encode())
-            data = b'\r\n'.join(body_parts)
+            # 成功响应（errcode缺失或为0）是绝大多数情况，只做一次取值和判断
+            errcode = result.get('errcode')
+            if not errcode:
+                return result
             
-        elif payload:
-            headers['Content-Type'] = 'application/json'
-            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            retryable = errcode in _RETRY_ERRCODES or (errcode in _IDEMPOTENT_RETRY_ERRCODES and idempotent)
+            if retryable and attempt < _MAX_RETRIES:
+                time.sleep(_backoff_delay(attempt, retry_after))
+                continue
+            
+            # 令牌被提前作废（如在其他地方刷新）时，换用新令牌后重试一次
+            if (
+                errcode in _TOKEN_INVALID_ERRCODES and require_token
+                and not token_refreshed and attempt < _MAX_RETRIES
+            ):
+                token_refreshed = True
+                access_token = self._refresh_stale_token(access_token)
+                request_url = self._build_url(path, params, access_token)
+                continue
+            
+            # 检查微信API错误，按错误码类别抛出对应异常，调用方无需解析错误信息
+            _raise_for_errcode(errcode, self._get_error_message(errcode), require_token)
+    
+    def _iter_multipart(self, payload: Optional[Dict], files: Dict):
+        """
+        逐块生成multipart/form-data请求体，文件数据作为单独的分块原样输出
+        
+        Args:
+            payload: 表单字段
+            files: 文件数据，值可以是bytes-like对象、BytesIO等文件对象或(文件数据, 文件名)元组
+            
+        Yields:
+            bytes: 请求体分块
+        """
+        # 添加表单字段
+        if payload:
+            for key, value in payload.items():
+                yield _MULTIPART_DELIMITER
+                yield f'Content-Disposition: form-data; name="{key}"\r\n\r\n'.encode()
+                yield (value if isinstance(value, str) else str(value)).encode()
+                yield _CRLF
         
-        # 发送请求
-        req = urllib.request.Request(url, data=data, headers=headers)
-        req.get_method = lambda: method.upper()
+        # 添加文件
+        for field_name, file_info in files.items():
+            if isinstance(file_info, tuple):
+                file_data, filename = file_info
+            else:
+                file_data = file_info
+                filename = 'file'
+            
+            # BytesIO等文件对象直接引用其内部缓冲区，不再读出为新的bytes
+            if hasattr(file_data, 'getbuffer'):
+                file_data = file_data.getbuffer()
+            elif hasattr(file_data, 'read'):
+                file_data = file_data.read()
+            # 以字节为单位的memoryview：长度即字节数，且发送时按已写入长度切片不会复制剩余数据
+            file_data = memoryview(file_data).cast('B')
+            
+            yield _MULTIPART_DELIMITER
+            yield f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'.encode()
+            yield _MULTIPART_FILE_CONTENT_TYPE
+            yield file_data
+            yield _CRLF
         
-        try:
-            with urllib.request.urlopen(req, timeout=timeout) as response:
-                if response.status != 200:
-                    raise Exception(f"HTTP请求失败，状态码: {response.status}")
-                
-                # 读取响应数据
-                response_data = response.read()
-                content_type = response.headers.get('Content-Type', '')
-                
-                # 判断是否为JSON响应
-                if content_type.startswith('application/json') or content_type.startswith('text/'):
-                    try:
-                        result = json.loads(response_data.decode('utf-8'))
-                        
-                        # 检查微信API错误
-                        if 'errcode' in result and result['errcode'] != 0:
-                            error_msg = self._get_error_message(result['errcode'])
-                            raise Exception(f"{error_msg} (错误码: {result['errcode']})")
-                        
+        yield _MULTIPART_CLOSE
+    
+    def _build_url(self, path: str, params: Optional[Dict] = None, access_token: Optional[str] = None) -> str:
+        """
+        构建包含查询参数和访问令牌的完整URL
+        
+        Args:
+            path: 接口路径
+            params: URL参数
+            access_token: 访问令牌，接口无需令牌时为None
+            
+        Returns:
+            str: 完整URL
+        """
+        url = self.API_BASE_URL + path
+        if access_token:
+            params = {**params, 'access_token': access_token} if params else {'access_token': access_token}
+        if params:
+            return f"{url}?{_urlencode(params)}"
+        return url
+    
+    def _parse_response(self, response: httpx.Response, stream: bool = False) -> Dict[str, Any]:
+        """
+        解析HTTP响应，JSON响应返回解析结果，其余作为二进制素材返回
+        
+        Args:
+            response: HTTP响应
+            stream: 是否以流式方式读取二进制响应
+            
+        Returns:
+            Dict: 响应数据，流式读取时非JSON内容一律位于binary_file（已定位到开头）
+        """
+        content_type = response.headers.get('Content-Type', '')
+        
+        # 判断是否为JSON响应
+        if content_type.startswith('application/json'):
+            response_data = response.read()
+            try:
+                result = _json_loads(response_data)
+            except ValueError as e:
+                raise Exception(f"响应解析失败: 无效的JSON数据 ({str(e)})")
+            if isinstance(result, dict):
+                return result
+        elif content_type.startswith('text/'):
+            # 部分接口以text/plain返回JSON，只在内容以{开头时才尝试解析
+            response_data = response.read()
+            if response_data.lstrip()[:1] == b'{':
+                try:
+                    result = _json_loads(response_data)
+                    if isinstance(result, dict):
                         return result
-                    except (json.JSONDecodeError, UnicodeDecodeError):
-                        # 如果JSON解析失败，可能是二进制数据，继续下面的处理
-                        pass
-                
-                # 处理二进制响应（图片、音频、视频等素材）
-                return {
-                    'binary_data': response_data,
-                    'headers': dict(response.headers),
-                    'content_type': content_type,
-                    'content_length': len(response_data)
-                }
-                
-        except urllib.error.HTTPError as e:
-            raise Exception(f"HTTP请求失败，状态码: {e.code}")
-        except urllib.error.URLError as e:
-            raise Exception(f"网络连接错误: {str(e)}")
-        except json.JSONDecodeError:
-            raise Exception("API返回的数据格式错误")
+                except ValueError:
+                    # 解析失败时按二进制数据处理
+                    pass
+        elif stream:
+            # 分块写入临时文件（小文件留在内存，超过阈值落盘），峰值内存只有一个分块
+            import tempfile
+            declared_length = response.headers.get('Content-Length', '')
+            identity = response.headers.get('Content-Encoding', 'identity').lower() == 'identity'
+            if identity and declared_length.isdigit() and int(declared_length) > _SPOOL_MAX_SIZE:
+                # 已知大小超过阈值时直接写入磁盘文件，避免先缓存在内存再整体复制到磁盘
+                binary_file = tempfile.TemporaryFile()
+            else:
+                binary_file = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+            content_length = 0
+            for chunk in response.iter_bytes(_STREAM_CHUNK_SIZE):
+                binary_file.write(chunk)
+                content_length += len(chunk)
+            binary_file.seek(0)
+            return {
+                'binary_file': binary_file,
+                'headers': response.headers,
+                'content_type': content_type,
+                'content_length': content_length
+            }
+        else:
+            response_data = response.read()
+        
+        if stream:
+            # 流式调用方只处理binary_file，已读入内存的非JSON文本响应同样以临时文件返回
+            import tempfile
+            binary_file = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_SIZE)
+            binary_file.write(response_data)
+            binary_file.seek(0)
+            return {
+                'binary_file': binary_file,
+                'headers': response.headers,
+                'content_type': content_type,
+                'content_length': len(response_data)
+            }
+        
+        # 处理二进制响应（图片、音频、视频等素材）
+        return {
+            'binary_data': response_data,
+            'headers': response.headers,
+            'content_type': content_type,
+            'content_length': len(response_data)
+        }
+    
+    def has_valid_token(self) -> bool:
+        """
+        检查进程内缓存中是否存在未过期的访问令牌
+        
+        Returns:
+            bool: 令牌可直接使用时返回True
+        """
+        cached = _TOKEN_CACHE.get(self._cache_key)
+        return bool(cached) and time.monotonic() < cached[1]
+    
+    def prefetch_token(self) -> Optional['Future']:
+        """
+        在后台线程中预取访问令牌，调用方可在等待期间处理请求数据
+        
+        Returns:
+            Optional[Future]: 预取任务，令牌已缓存时返回None
+        """
+        if self.has_valid_token():
+            return None
+        return _get_prefetch_executor().submit(self.get_access_token)
     
     def get_access_token(self, force_refresh: bool = False) -> str:
         """
-        获取稳定访问令牌
+        获取稳定访问令牌，按(app_id, app_secret)在进程内缓存至expires_in到期前
         
         Args:
             force_refresh: 是否强制刷新
@@ -183,7 +974,45 @@ class WeChatRequest:
         Returns:
             str: 访问令牌
         """
-        url = f"{self.API_BASE_URL}/cgi-bin/stable_token"
+        # 令牌已缓存时无需加锁
+        if not force_refresh:
+            cached = _TOKEN_CACHE.get(self._cache_key)
+            if cached and time.monotonic() < cached[1]:
+                return cached[0]
+        
+        with _get_token_lock(self._cache_key):
+            # 等待锁期间其他线程可能已刷新令牌
+            cached = _TOKEN_CACHE.get(self._cache_key)
+            if cached and not force_refresh and time.monotonic() < cached[1]:
+                return cached[0]
+            
+            # 其他工作进程可能已经刷新过令牌，优先复用共享存储中的令牌
+            store = get_token_store()
+            if force_refresh:
+                try:
+                    store.delete(self._store_key)
+                except Exception:
+                    pass
+            else:
+                stored = self._load_stored_token(store)
+                if stored:
+                    return stored
+            
+            return self.fetch_access_token(force_refresh, store)
+    
+    def fetch_access_token(self, force_refresh: bool = False, store: Optional[TokenStore] = None) -> str:
+        """
+        不经缓存直接请求stable_token接口获取令牌，并写入进程内缓存和共享存储
+        
+        Args:
+            force_refresh: 是否强制刷新
+            store: 令牌存储，默认使用get_token_store()
+            
+        Returns:
+            str: 访问令牌
+        """
+        if store is None:
+            store = get_token_store()
         payload = {
             'grant_type': 'client_credential',
             'appid': self.app_id,
@@ -191,16 +1020,76 @@ class WeChatRequest:
             'force_refresh': force_refresh
         }
         
-        result = self._send_request(url, require_token=False, payload=payload)
-        return result['access_token']
+        result = self._send_request(self._PATH_STABLE_TOKEN, require_token=False, payload=payload)
+        access_token = result['access_token']
+        expires_in = int(result.get('expires_in', 7200))
+        _TOKEN_CACHE[self._cache_key] = (
+            access_token,
+            time.monotonic() + expires_in - _TOKEN_EXPIRY_MARGIN
+        )
+        try:
+            store.set(self._store_key, access_token, time.time() + expires_in - _TOKEN_EXPIRY_MARGIN)
+        except Exception:
+            # 共享存储不可用时仍可使用进程内缓存
+            pass
+        self._access_token = access_token
+        return access_token
     
-    def upload_material(self, media_type: str, file_data: bytes, filename: str = None, title: str = None, introduction: str = None) -> Dict[str, Any]:
+    def _refresh_stale_token(self, stale_token: str) -> str:
+        """
+        令牌被微信判定无效后获取新令牌：其他线程或工作进程已换新时直接复用，
+        否则作废共享存储中的令牌并强制刷新，避免多个进程轮流强制刷新使彼此的令牌失效
+        
+        Args:
+            stale_token: 被判定无效的令牌
+            
+        Returns:
+            str: 新的访问令牌
+        """
+        with _get_token_lock(self._cache_key):
+            cached = _TOKEN_CACHE.get(self._cache_key)
+            if cached and cached[0] != stale_token and time.monotonic() < cached[1]:
+                return cached[0]
+            
+            stored = self._load_stored_token(get_token_store())
+            if stored and stored != stale_token:
+                return stored
+            
+            return self.get_access_token(force_refresh=True)
+    
+    def _load_stored_token(self, store: TokenStore) -> Optional[str]:
+        """
+        从共享存储读取未过期的令牌并回填进程内缓存
+        
+        Args:
+            store: 令牌存储
+            
+        Returns:
+            Optional[str]: 访问令牌，不存在或已过期时返回None
+        """
+        try:
+            stored = store.get(self._store_key)
+        except Exception:
+            return None
+        if not stored:
+            return None
+        
+        token, expires_at = stored
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return None
+        
+        _TOKEN_CACHE[self._cache_key] = (token, time.monotonic() + remaining)
+        self._access_token = token
+        return token
+    
+    def upload_material(self, media_type: str, file_data: Union[bytes, bytearray, memoryview, BinaryIO], filename: str = None, title: str = None, introduction: str = None) -> Dict[str, Any]:
         """
         上传永久素材
         
         Args:
             media_type: 媒体类型 (image, voice, video, thumb)
-            file_data: 文件数据
+            file_data: 文件数据，支持任意bytes-like对象或BytesIO等文件对象，直接写入请求体而不额外复制
             filename: 文件名（可选）
             title: 视频标题（视频类型必需）
             introduction: 视频介绍（视频类型必需）
@@ -208,7 +1097,6 @@ class WeChatRequest:
         Returns:
             Dict: 上传结果
         """
-        url = f"{self.API_BASE_URL}/cgi-bin/material/add_material"
         params = {'type': media_type}
         
         # 如果提供了文件名，使用元组格式；否则只传文件数据
@@ -220,12 +1108,12 @@ class WeChatRequest:
         payload = {}
         
         if media_type == 'video' and title and introduction:
-            payload['description'] = json.dumps({
+            payload['description'] = _json_dumps({
                 'title': title,
                 'introduction': introduction
-            })
+            }).decode('utf-8')
         
-        return self._send_request(url, params=params, files=files, payload=payload if payload else None)
+        return self._send_request(self._PATH_ADD_MATERIAL, params=params, files=files, payload=payload if payload else None)
     
     def get_material(self, media_id: str) -> Dict[str, Any]:
         """
@@ -235,12 +1123,12 @@ class WeChatRequest:
             media_id: 媒体ID
             
         Returns:
-            Dict: 素材信息
+            Dict: 素材信息；图片、语音、视频等二进制素材以流式方式写入binary_file，
+                调用方使用完毕后需关闭该文件
         """
-        url = f"{self.API_BASE_URL}/cgi-bin/material/get_material"
         payload = {'media_id': media_id}
         
-        return self._send_request(url, payload=payload)
+        return self._send_request(self._PATH_GET_MATERIAL, payload=payload, stream=True)
     
     def delete_material(self, media_id: str) -> Dict[str, Any]:
         """
@@ -252,30 +1140,28 @@ class WeChatRequest:
         Returns:
             Dict: 删除结果
         """
-        url = f"{self.API_BASE_URL}/cgi-bin/material/del_material"
         payload = {'media_id': media_id}
         
-        return self._send_request(url, payload=payload)
+        return self._send_request(self._PATH_DEL_MATERIAL, payload=payload)
     
-    def create_draft(self, articles: str) -> Dict[str, Any]:
+    def create_draft(self, articles: Union[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
         """
         创建草稿
         
         Args:
-            articles: 文章数据JSON字符串
+            articles: 文章列表，或文章数据JSON字符串；传入列表时无需再解析一次JSON
             
         Returns:
             Dict: 创建结果
         """
-        url = f"{self.API_BASE_URL}/cgi-bin/draft/add"
-        
-        try:
-            articles_data = json.loads(articles)
-            payload = {'articles': articles_data}
-        except json.JSONDecodeError:
-            raise Exception("文章数据格式错误，请提供有效的JSON字符串")
+        if isinstance(articles, str):
+            try:
+                articles = _json_loads(articles)
+            except json.JSONDecodeError:
+                raise Exception("文章数据格式错误，请提供有效的JSON字符串")
+        payload = {'articles': articles}
         
-        return self._send_request(url, payload=payload)
+        return self._send_request(self._PATH_ADD_DRAFT, payload=payload)
     
     def publish_draft(self, media_id: str) -> Dict[str, Any]:
         """
@@ -287,23 +1173,21 @@ class WeChatRequest:
         Returns:
             Dict: 发布结果
         """
-        url = f"{self.API_BASE_URL}/cgi-bin/freepublish/submit"
         payload = {'media_id': media_id}
         
-        return self._send_request(url, payload=payload)
+        return self._send_request(self._PATH_SUBMIT_PUBLISH, payload=payload)
     
-    def upload_image(self, file_data: bytes, filename: str = None) -> Dict[str, Any]:
+    def upload_image(self, file_data: Union[bytes, bytearray, memoryview, BinaryIO], filename: str = None) -> Dict[str, Any]:
         """
         上传图文消息图片
         
         Args:
-            file_data: 图片文件数据
+            file_data: 图片文件数据，支持任意bytes-like对象或BytesIO等文件对象
             filename: 文件名（可选）
             
         Returns:
             Dict: 上传结果，包含图片URL
         """
-        url = f"{self.API_BASE_URL}/cgi-bin/media/uploadimg"
         
         # 如果提供了文件名，使用元组格式；否则只传文件数据
         if filename:
@@ -311,7 +1195,32 @@ class WeChatRequest:
         else:
             files = {'media': file_data}
         
-        return self._send_request(url, files=files)
+        return self._send_request(self._PATH_UPLOAD_IMAGE, files=files)
+    
+    def batch_upload_images(self, items: List[tuple[Union[bytes, bytearray, memoryview, BinaryIO], str]]) -> List[Dict[str, Any]]:
+        """
+        并发上传多张图文消息图片
+        
+        Args:
+            items: (图片文件数据, 文件名)列表
+            
+        Returns:
+            List[Dict]: 与items顺序一致的上传结果；单张失败时对应结果包含errcode和errmsg
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        def upload(item: tuple) -> Dict[str, Any]:
+            try:
+                return self.upload_image(*item)
+            except WeChatError as e:
+                return {'errcode': e.code, 'errmsg': e.msg}
+            except Exception as e:
+                return {'errcode': -1, 'errmsg': str(e)}
+        
+        # 先在当前线程获取令牌，避免各线程同时等待令牌刷新
+        self.get_access_token()
+        with ThreadPoolExecutor(max_workers=_BATCH_UPLOAD_WORKERS) as executor:
+            return list(executor.map(upload, items))
     
     def _get_error_message(self, errcode: int) -> str:
         """
@@ -323,159 +1232,4 @@ class WeChatRequest:
         Returns:
             str: 错误信息
         """
-        error_messages = {
-            40001: 'AppSecret错误或者AppSecret不属于这个公众号',
-            40002: '不合法的凭证类型',
-            40004: '不合法的媒体文件类型',
-            40005: '不合法的文件类型',
-            40006: '不合法的文件大小',
-            40007: '不合法的媒体文件id',
-            40008: '不合法的消息类型',
-            40009: '不合法的图片文件大小',
-            40010: '不合法的语音文件大小',
-            40011: '不合法的视频文件大小',
-            40012: '不合法的缩略图文件大小',
-            40013: '不合法的AppID',
-            40014: '不合法的access_token',
-            40113: '不支持的媒体文件格式',
-            40164: '调用接口的IP地址不在白名单中，请在微信公众平台后台添加服务器IP到白名单',
-            40015: '不合法的菜单类型',
-            40016: '不合法的按钮个数',
-            40017: '不合法的按钮个数',
-            40018: '不合法的按钮名字长度',
-            40019: '不合法的按钮KEY长度',
-            40020: '不合法的按钮URL长度',
-            40021: '不合法的菜单版本号',
-            40022: '不合法的子菜单级数',
-            40023: '不合法的子菜单按钮个数',
-            40024: '不合法的子菜单按钮类型',
-            40025: '不合法的子菜单按钮名字长度',
-            40026: '不合法的子菜单按钮KEY长度',
-            40027: '不合法的子菜单按钮URL长度',
-            40028: '不合法的自定义菜单使用用户',
-            40029: '不合法的oauth_code',
-            40030: '不合法的refresh_token',
-            40031: '不合法的openid列表',
-            40032: '不合法的openid列表长度',
-            40033: '不合法的请求字符，不能包含\\uxxxx格式的字符',
-            40035: '不合法的参数',
-            40038: '不合法的请求格式',
-            40039: '不合法的URL长度',
-            40050: '不合法的分组id',
-            40051: '分组名字不合法',
-            40117: '分组名字不合法',
-            40118: 'media_id大小不合法',
-            40119: 'button类型错误',
-            40120: 'button类型错误',
-            40121: '不合法的media_id类型',
-            40132: '微信号不合法',
-            40137: '不支持的图片格式',
-            40155: '请勿添加其他公众号的主页链接',
-            41001: '缺少access_token参数',
-            41002: '缺少appid参数',
-            41003: '缺少refresh_token参数',
-            41004: '缺少secret参数',
-            41005: '缺少多媒体文件数据',
-            41006: '缺少media_id参数',
-            41007: '缺少子菜单数据',
-            41008: '缺少oauth code',
-            41009: '缺少openid',
-            42001: 'access_token超时，请检查access_token的有效期',
-            42002: 'refresh_token超时',
-            42003: 'oauth_code超时',
-            42007: '用户修改微信密码，accesstoken和refreshtoken失效，需要重新授权',
-            43001: '需要GET请求',
-            43002: '需要POST请求',
-            43003: '需要HTTPS请求',
-            43004: '需要接收者关注',
-            43005: '需要好友关系',
-            43019: '需要将接收者从黑名单中移除',
-            44001: '多媒体文件为空',
-            44002: 'POST的数据包为空',
-            44003: '图文消息内容为空',
-            44004: '文本消息内容为空',
-            45001: '多媒体文件大小超过限制',
-            45002: '消息内容超过限制',
-            45003: '标题字段超过限制',
-            45004: '描述字段超过限制',
-            45005: '链接字段超过限制',
-            45006: '图片链接字段超过限制',
-            45007: '语音播放时间超过限制',
-            45008: '图文消息超过限制',
-            45009: '接口调用超过限制',
-            45010: '创建菜单个数超过限制',
-            45015: '回复时间超过限制',
-            45016: '系统分组，不允许修改',
-            45017: '分组名字过长',
-            45018: '分组数量超过上限',
-        45110: '草稿创建失败，可能是参数格式错误或权限不足',
-        45047: '客服接口下行条数超过上限',
-            46001: '不存在媒体数据',
-            46002: '不存在的菜单版本',
-            46003: '不存在的菜单数据',
-            46004: '不存在的用户',
-            47001: '解析JSON/XML内容错误',
-            48001: 'api功能未授权，请确认公众号已获得该接口，可以在公众平台官网-开发者中心页中查看接口权限',
-            48002: '粉丝拒收消息（粉丝在公众号选项中，关闭了"接收消息"）',
-            48004: 'api接口被封禁，请登录mp.weixin.qq.com查看详情',
-            48005: 'api禁止删除被自动回复和自定义菜单引用的素材',
-            48006: 'api禁止清零调用次数，因为清零次数达到上限',
-            48008: '没有该类型消息的发送权限',
-            50001: '用户未授权该api',
-            50002: '用户受限，可能是违规后接口被封禁',
-            50005: '用户未关注公众号',
-            61451: '参数错误(invalid parameter)',
-            61452: '无效客服账号(invalid kf_account)',
-            61453: '客服帐号已存在(kf_account exsited)',
-            61454: '客服帐号名长度超过限制(仅允许10个英文字符，不包括@及@后的公众号的微信号)(invalid kf_acount length)',
-            61455: '客服帐号名包含非法字符(仅允许英文+数字)(illegal character in kf_account)',
-            61456: '客服帐号个数超过限制(10个客服账号)(kf_account count exceeded)',
-            61457: '无效头像文件类型(invalid file type)',
-            61450: '系统错误(system error)',
-            61500: '日期格式错误',
-            65301: '不存在此menuid对应的个性化菜单',
-            65302: '没有相应的用户',
-            65303: '没有默认菜单，不能创建个性化菜单',
-            65304: 'MatchRule信息为空',
-            65305: '个性化菜单数量受限',
-            65306: '不支持个性化菜单的帐号',
-            65307: '个性化菜单信息为空',
-            65308: '包含没有响应类型的button',
-            65309: '个性化菜单开关处于关闭状态',
-            65310: '填写了省份或城市信息，国家信息不能为空',
-            65311: '填写了城市信息，省份信息不能为空',
-            65312: '不合法的国家信息',
-            65313: '不合法的省份信息',
-            65314: '不合法的城市信息',
-            65316: '该公众号的菜单设置了过多的域名外跳（最多跳转到3个域名的链接）',
-            65317: '不合法的URL',
-            9001001: 'POST数据参数不合法',
-            9001002: '远端服务不可用',
-            9001003: 'Ticket不合法',
-            9001004: '获取摇周边用户信息失败',
-            9001005: '获取商户信息失败',
-            9001006: '获取OpenID失败',
-            9001007: '上传文件缺失',
-            9001008: '上传素材的文件类型不合法',
-            9001009: '上传素材的文件尺寸不合法',
-            9001010: '上传失败',
-            9001020: '帐号不合法',
-            9001021: '已有设备激活率低于50%，不能新增设备',
-            9001022: '设备申请数不合法，必须为大于0的数字',
-            9001023: '已存在审核中的设备ID申请',
-            9001024: '一次查询设备ID数量不能超过50',
-            9001025: '设备ID不合法',
-            9001026: '页面ID不合法',
-            9001027: '页面参数不合法',
-            9001028: '一次删除页面ID数量不能超过10',
-            9001029: '页面已应用在设备中，请先解除应用关系再删除',
-            9001030: '一次查询页面ID数量不能超过50',
-            9001031: '时间区间不合法',
-            9001032: '保存设备与页面的绑定关系参数错误',
-            9001033: '门店ID不合法',
-            9001034: '设备备注信息过长',
-            9001035: '设备申请参数不合法',
-            9001036: '查询起始值begin不合法'
-        }
-        
-        return error_messages.get(errcode, f'未知错误码: {errcode}')
\ No newline at end of file
+        return WECHAT_ERRORS.get(errcode, f'未知错误码: {errcode}')
\ No newline at end of file